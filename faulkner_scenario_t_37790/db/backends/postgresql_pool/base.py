@@ -0,0 +1,74 @@
+"""
+PostgreSQL backend that draws connections from an in-process pool.
+
+Enabled with DB_POOL=1 (see settings). Django still "closes" the connection at the
+end of each request when CONN_MAX_AGE is 0, but close() hands it back to the pool
+instead of tearing it down, so the TCP/TLS/auth handshake leaves the request path.
+Pool options come from the `POOL` key of the database settings:
+
+    'POOL': {'MAX_SIZE': 4, 'TIMEOUT': 30, 'CHECK_INTERVAL': 30}
+"""
+from django.db.backends.postgresql import base
+
+from faulkner_scenario_t_37790.db.pool import get_pool
+
+Database = base.Database
+
+
+def is_usable(connection):
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except Database.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # The pool the current connection was checked out of.
+    _pool = None
+
+    def pool_for(self, conn_params):
+        """The pool of connections made with `conn_params`, created on first use."""
+        options = self.settings_dict.get('POOL', {})
+        return get_pool(
+            self.alias,
+            repr(sorted(conn_params.items())),
+            max_size=options.get('MAX_SIZE', 4),
+            timeout=options.get('TIMEOUT', 30),
+            check_interval=options.get('CHECK_INTERVAL', 30),
+            health_check=is_usable,
+        )
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool_for(conn_params)
+        connection = pool.checkout(lambda: Database.connect(**conn_params))
+        self._pool = pool
+        # As base.get_new_connection() does; _close() put reused connections back to
+        # the server's default isolation level.
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get('isolation_level', connection.isolation_level)
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        connection, pool = self.connection, self._pool
+        if connection.closed:
+            pool.discard(connection)
+            return
+        try:
+            # ROLLBACK of any open transaction, RESET ALL, SET SESSION AUTHORIZATION DEFAULT.
+            connection.reset()
+            # Hand it out as psycopg2.connect() would; connect() re-applies Django's settings.
+            connection.set_session(
+                isolation_level='DEFAULT', readonly='DEFAULT', deferrable='DEFAULT', autocommit=False,
+            )
+        except Database.Error:
+            pool.discard(connection)
+            return
+        pool.checkin(connection)
@@ -0,0 +1,152 @@
+"""
+In-process database connection pool.
+
+The pool is driver agnostic: callers hand it a zero-argument `connect` callable when
+checking out, and an optional `health_check(connection) -> bool` run on connections
+that sat idle for longer than `check_interval` seconds. Pools are shared by every
+thread of the process and registered per database alias and connection target so
+their metrics can be reported (see `pool_stats`).
+"""
+import time
+from collections import deque
+from threading import Condition, Lock
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, max_size, timeout=30, health_check=None, check_interval=30):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check = health_check
+        self.check_interval = check_interval
+        # (connection, returned_at) pairs; reused LIFO so hot connections stay hot.
+        self._idle = deque()
+        self._size = 0
+        self._condition = Condition()
+        self.metrics = {
+            'checkouts': 0,
+            'connections_created': 0,
+            'connections_discarded': 0,
+            'health_checks': 0,
+            'waits': 0,
+            'timeouts': 0,
+        }
+
+    def checkout(self, connect):
+        while True:
+            connection, returned_at = self._reserve()
+            if connection is None:
+                try:
+                    connection = connect()
+                except BaseException:
+                    self._release_slot()
+                    raise
+                self._count('connections_created')
+            elif self.health_check and time.monotonic() - returned_at >= self.check_interval:
+                self._count('health_checks')
+                if not self.health_check(connection):
+                    self.discard(connection)
+                    continue
+            self._count('checkouts')
+            return connection
+
+    def checkin(self, connection):
+        with self._condition:
+            self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        self._count('connections_discarded')
+        self._release_slot()
+
+    def close_all(self):
+        with self._condition:
+            idle, self._idle = self._idle, deque()
+        for connection, _ in idle:
+            self.discard(connection)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                **self.metrics,
+            }
+
+    def _reserve(self):
+        """
+        An idle (connection, returned_at) pair, or (None, None) once a slot for a new
+        connection has been reserved. Blocks while the pool is exhausted.
+        """
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            waited = False
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None, None
+                if not waited:
+                    self.metrics['waits'] += 1
+                    waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._condition.wait(remaining):
+                    if not self._idle and self._size >= self.max_size:
+                        self.metrics['timeouts'] += 1
+                        raise PoolTimeout(
+                            f"No database connection available after {self.timeout}s "
+                            f"(max_size={self.max_size})."
+                        )
+
+    def _release_slot(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    def _count(self, metric):
+        with self._condition:
+            self.metrics[metric] += 1
+
+
+# (alias, key) -> pool, in creation order.
+_pools = {}
+_pools_lock = Lock()
+
+
+def get_pool(alias, key=None, **options):
+    """
+    The process-wide pool of a database alias, created on first use. `key` identifies
+    what the pool connects to: an alias whose connection settings change (as the test
+    runner's do) gets a new pool instead of connections to the old database.
+    """
+    with _pools_lock:
+        if (alias, key) not in _pools:
+            _pools[alias, key] = ConnectionPool(**options)
+        return _pools[alias, key]
+
+
+def pool_stats():
+    """
+    Current metrics of every pool in this process, keyed by database alias; an alias's
+    later pools are reported as "<alias>#2", "<alias>#3"...
+    """
+    with _pools_lock:
+        pools = list(_pools.items())
+    stats = {}
+    for (alias, _), pool in pools:
+        name, number = alias, 1
+        while name in stats:
+            number += 1
+            name = f'{alias}#{number}'
+        stats[name] = pool.stats()
+    return stats
@@ -0,0 +1,67 @@
+"""
+Loads the env-file formatted settings payload stored in GCP Secret Manager.
+
+Fetching it costs a credentials probe plus an RPC (or their timeouts when GCP is not
+reachable), so the decoded payload is cached on disk for `cache_ttl` seconds and the
+google.* client libraries are only imported when a fetch actually happens.
+"""
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def fetch_secret_payload(settings_name):
+    """The latest version of the secret, or None when GCP credentials are unavailable."""
+    import google.auth
+    from google.api_core.exceptions import PermissionDenied
+    from google.auth.exceptions import DefaultCredentialsError
+    from google.cloud import secretmanager
+
+    try:
+        _, project = google.auth.default()
+        client = secretmanager.SecretManagerServiceClient()
+        name = client.secret_version_path(project, settings_name, "latest")
+        return client.access_secret_version(name=name).payload.data.decode("UTF-8")
+    except (DefaultCredentialsError, PermissionDenied):
+        return None
+
+
+def read_cached_payload(cache_path, cache_ttl):
+    try:
+        if time.time() - os.path.getmtime(cache_path) > cache_ttl:
+            return None
+        with open(cache_path, "r") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def write_cached_payload(cache_path, payload):
+    # Written to a private temp file and renamed so concurrent workers never read a
+    # partial payload.
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path) or ".")
+        with os.fdopen(fd, "w") as f:
+            f.write(payload)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        logger.warning("Could not cache Secret Manager settings at %s", cache_path)
+
+
+def load_secret_settings(settings_name, cache_path=None, cache_ttl=0, fetch=fetch_secret_payload):
+    """
+    The settings payload, from the disk cache when it is younger than `cache_ttl`
+    seconds, otherwise from `fetch`. None when no payload is available.
+    """
+    if cache_path and cache_ttl > 0:
+        payload = read_cached_payload(cache_path, cache_ttl)
+        if payload is not None:
+            return payload
+
+    payload = fetch(settings_name)
+    if payload is not None and cache_path and cache_ttl > 0:
+        write_cached_payload(cache_path, payload)
+    return payload
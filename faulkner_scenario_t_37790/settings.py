@@ -17,12 +17,8 @@ import logging
 import json
 import base64
 import binascii
-import google.auth
-from google.oauth2 import service_account
-from google.cloud import secretmanager
-from google.auth.exceptions import DefaultCredentialsError
-from google.api_core.exceptions import PermissionDenied
 from modules.manifest import get_modules
+from faulkner_scenario_t_37790.secret_settings import load_secret_settings
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -34,16 +30,18 @@ env.read_env(env_file)
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = env.bool("DEBUG", default=False)
 
-try:
-    # Pull secrets from Secret Manager
-    _, project = google.auth.default()
-    client = secretmanager.SecretManagerServiceClient()
+# Pull secrets from Secret Manager, unless disabled (local development, CI).
+# The payload is cached on disk so only the first process in SECRET_MANAGER_CACHE_TTL
+# seconds pays for the credentials probe and the RPC.
+if not env.bool("SKIP_SECRET_MANAGER", default=False):
     settings_name = os.environ.get("SETTINGS_NAME", "django_settings")
-    name = client.secret_version_path(project, settings_name, "latest")
-    payload = client.access_secret_version(name=name).payload.data.decode("UTF-8")
-    env.read_env(io.StringIO(payload))
-except (DefaultCredentialsError, PermissionDenied):
-    pass
+    payload = load_secret_settings(
+        settings_name,
+        cache_path=env.str("SECRET_MANAGER_CACHE_PATH", default=os.path.join(BASE_DIR, f".{settings_name}.cache")),
+        cache_ttl=env.int("SECRET_MANAGER_CACHE_TTL", default=300),
+    )
+    if payload is not None:
+        env.read_env(io.StringIO(payload))
 
 
 # Quick-start development settings - unsuitable for production
@@ -71,7 +69,7 @@ INSTALLED_APPS = [
     'django.contrib.sites'
 ]
 LOCAL_APPS = [
-    'home',
+    'home.apps.HomeConfig',
     'users.apps.UsersConfig',
 ]
 THIRD_PARTY_APPS = [
@@ -84,15 +82,20 @@ THIRD_PARTY_APPS = [
     'allauth.account',
     'allauth.socialaccount',
     'allauth.socialaccount.providers.google',
-    'django_extensions',
-    'drf_yasg',
-    'storages',
 ]
+# Optional apps are only loaded where they are used, to keep cold starts of web
+# workers, release-phase migrate and one-off commands cheap.
+API_DOCS = env.bool("API_DOCS", default=True)
+if API_DOCS:
+    THIRD_PARTY_APPS += ['drf_yasg']
+if env.bool("DJANGO_EXTENSIONS", default=DEBUG):
+    THIRD_PARTY_APPS += ['django_extensions']
 MODULES_APPS = get_modules()
 
 INSTALLED_APPS += LOCAL_APPS + THIRD_PARTY_APPS + MODULES_APPS
 
 MIDDLEWARE = [
+    'home.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -138,6 +141,73 @@ if env.str("DATABASE_URL", default=None):
         'default': env.db()
     }
 
+# Seconds a connection is kept open between requests (0 closes it after every
+# request, None keeps it forever).
+DATABASES['default']['CONN_MAX_AGE'] = env.int("CONN_MAX_AGE", default=60)
+
+# Worker threads of waitress-serve (see Dockerfile), which bound concurrent queries.
+WAITRESS_THREADS = env.int("WAITRESS_THREADS", default=4)
+
+# Optional in-process connection pool for PostgreSQL. Connections are handed back
+# to the pool when Django closes them, so CONN_MAX_AGE is forced to 0.
+if env.bool("DB_POOL", default=False) and DATABASES['default']['ENGINE'].startswith('django.db.backends.postgresql'):
+    DATABASES['default'].update({
+        'ENGINE': 'faulkner_scenario_t_37790.db.backends.postgresql_pool',
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MAX_SIZE': env.int("DB_POOL_MAX_SIZE", default=WAITRESS_THREADS),
+            'TIMEOUT': env.int("DB_POOL_TIMEOUT", default=30),
+            'CHECK_INTERVAL': env.int("DB_POOL_CHECK_INTERVAL", default=30),
+        },
+    })
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+# Redis when REDIS_URL is set (docker-compose starts one), process-local otherwise.
+
+CACHES = {
+    'default': env.cache("REDIS_URL", default="locmemcache://")
+}
+# Treat an unreachable Redis as a cache miss instead of failing the request.
+DJANGO_REDIS_IGNORE_EXCEPTIONS = True
+DJANGO_REDIS_LOG_IGNORED_EXCEPTIONS = True
+
+# Seconds a cached API payload may be served before it is rebuilt, even without
+# an invalidating write.
+API_CACHE_TIMEOUT = env.int("API_CACHE_TIMEOUT", 60 * 60)
+
+REST_FRAMEWORK = {
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "rest_framework.authentication.SessionAuthentication",
+        "home.api.v1.authentication.CachedTokenAuthentication",
+        "rest_framework.authentication.BasicAuthentication",
+    ],
+    # DRF's JSON renderer and parser until orjson is pinned in Pipfile.lock; then
+    # home.api.v1.renderers.FastJSONRenderer and parsers.FastJSONParser replace them.
+}
+# Token -> user lookups are cached in the shared cache and, for
+# TOKEN_AUTH_LOCAL_CACHE_TIMEOUT seconds, in each process. That local timeout is how
+# long another worker may keep accepting a revoked token.
+TOKEN_AUTH_CACHE_TIMEOUT = env.int("TOKEN_AUTH_CACHE_TIMEOUT", 60 * 60)
+TOKEN_AUTH_LOCAL_CACHE_TIMEOUT = env.int("TOKEN_AUTH_LOCAL_CACHE_TIMEOUT", 10)
+TOKEN_AUTH_LOCAL_CACHE_SIZE = env.int("TOKEN_AUTH_LOCAL_CACHE_SIZE", 1024)
+
+# Concurrent password hashes per process, and how many logins may wait for one
+# before /api/v1/login/ answers 503 (see home.hashing).
+PASSWORD_HASHING_WORKERS = env.int("PASSWORD_HASHING_WORKERS", default=os.cpu_count() or 1)
+PASSWORD_HASHING_QUEUE = env.int("PASSWORD_HASHING_QUEUE", default=32)
+
+# Request instrumentation (home.middleware.InstrumentationMiddleware). Server-Timing
+# headers are always sent to staff users; SERVER_TIMING sends them to everyone.
+# Queries slower than SLOW_QUERY_MS are logged on `home.slow_queries` with the view
+# method that issued them; unset disables the log.
+SERVER_TIMING = env.bool("SERVER_TIMING", default=DEBUG)
+SLOW_QUERY_MS = env.float("SLOW_QUERY_MS", default=None)
+
+# Rows fetched per round-trip by the streaming exports (home.export).
+EXPORT_CHUNK_SIZE = env.int("EXPORT_CHUNK_SIZE", default=2000)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -267,9 +337,13 @@ def google_service_account_config():
         return {}
 GOOGLE_SERVICE_ACCOUNT_CONFIG = google_service_account_config()
 if GOOGLE_SERVICE_ACCOUNT_CONFIG:
+    from google.oauth2 import service_account
     GS_CREDENTIALS = service_account.Credentials.from_service_account_info(GOOGLE_SERVICE_ACCOUNT_CONFIG)
 GS_BUCKET_NAME = env.str("GS_BUCKET_NAME", "")
 if GS_BUCKET_NAME:
     DEFAULT_FILE_STORAGE = "storages.backends.gcloud.GoogleCloudStorage"
     STATICFILES_STORAGE = "storages.backends.gcloud.GoogleCloudStorage"
     GS_DEFAULT_ACL = "publicRead"
+
+if USE_S3 or GS_BUCKET_NAME:
+    INSTALLED_APPS += ['storages']
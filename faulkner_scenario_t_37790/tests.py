@@ -0,0 +1,207 @@
+import os
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from faulkner_scenario_t_37790.db import pool as pool_module
+from faulkner_scenario_t_37790.db.backends.postgresql_pool.base import Database, DatabaseWrapper
+from faulkner_scenario_t_37790.db.pool import ConnectionPool, PoolTimeout
+from faulkner_scenario_t_37790.secret_settings import load_secret_settings
+
+
+def connect():
+    return sqlite3.connect(':memory:', check_same_thread=False)
+
+
+def is_usable(connection):
+    try:
+        connection.execute('SELECT 1')
+    except sqlite3.ProgrammingError:
+        return False
+    return True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def test_connections_are_reused(self):
+        pool = ConnectionPool(max_size=2)
+        connection = pool.checkout(connect)
+        pool.checkin(connection)
+        self.assertIs(pool.checkout(connect), connection)
+        stats = pool.stats()
+        self.assertEqual(stats['connections_created'], 1)
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['in_use'], 1)
+
+    def test_checkout_waits_for_a_free_connection(self):
+        pool = ConnectionPool(max_size=1, timeout=5)
+        connection = pool.checkout(connect)
+        threading.Timer(0.05, pool.checkin, [connection]).start()
+        self.assertIs(pool.checkout(connect), connection)
+        self.assertEqual(pool.stats()['waits'], 1)
+
+    def test_checkout_times_out_when_exhausted(self):
+        pool = ConnectionPool(max_size=1, timeout=0.05)
+        pool.checkout(connect)
+        with self.assertRaises(PoolTimeout):
+            pool.checkout(connect)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_unhealthy_connections_are_replaced(self):
+        pool = ConnectionPool(max_size=1, health_check=is_usable, check_interval=0)
+        connection = pool.checkout(connect)
+        connection.close()
+        pool.checkin(connection)
+        replacement = pool.checkout(connect)
+        self.assertIsNot(replacement, connection)
+        self.assertTrue(is_usable(replacement))
+        stats = pool.stats()
+        self.assertEqual(stats['connections_discarded'], 1)
+        self.assertEqual(stats['size'], 1)
+
+    def test_health_check_skipped_for_recently_used_connections(self):
+        pool = ConnectionPool(max_size=1, health_check=is_usable, check_interval=60)
+        pool.checkin(pool.checkout(connect))
+        pool.checkout(connect)
+        self.assertEqual(pool.stats()['health_checks'], 0)
+
+    def test_failed_connect_frees_its_slot(self):
+        pool = ConnectionPool(max_size=1, timeout=0.05)
+
+        def broken_connect():
+            raise sqlite3.OperationalError('connection refused')
+
+        with self.assertRaises(sqlite3.OperationalError):
+            pool.checkout(broken_connect)
+        self.assertIsNotNone(pool.checkout(connect))
+
+    def test_size_never_exceeds_max_size(self):
+        pool = ConnectionPool(max_size=3, timeout=5)
+        peak = []
+
+        def worker():
+            for _ in range(20):
+                connection = pool.checkout(connect)
+                peak.append(pool.stats()['in_use'])
+                time.sleep(0.001)
+                pool.checkin(connection)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(max(peak), 3)
+        self.assertLessEqual(pool.stats()['connections_created'], 3)
+
+
+class PooledDatabaseWrapperTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(pool_module._pools, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(Database, 'connect', side_effect=self.connect)
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def connect(self, **conn_params):
+        return mock.Mock(closed=0, isolation_level=None, conn_params=conn_params)
+
+    def wrapper(self, name='app', options=None):
+        settings_dict = {
+            'NAME': name, 'USER': 'app', 'PASSWORD': '', 'HOST': 'db', 'PORT': '',
+            'OPTIONS': options or {}, 'POOL': {'MAX_SIZE': 2},
+        }
+        return DatabaseWrapper(settings_dict, 'default')
+
+    def open(self, wrapper):
+        wrapper.connection = wrapper.get_new_connection(wrapper.get_connection_params())
+        return wrapper.connection
+
+    def close(self, wrapper):
+        wrapper._close()
+        wrapper.connection = None
+
+    def test_connection_is_reset_and_reused(self):
+        wrapper = self.wrapper()
+        connection = self.open(wrapper)
+        self.close(wrapper)
+        connection.reset.assert_called_once_with()
+        connection.set_session.assert_called_once_with(
+            isolation_level='DEFAULT', readonly='DEFAULT', deferrable='DEFAULT', autocommit=False,
+        )
+        self.assertIs(self.open(self.wrapper()), connection)
+        self.assertEqual(self.connect.call_count, 1)
+
+    def test_other_database_gets_its_own_connection(self):
+        wrapper = self.wrapper('app')
+        self.open(wrapper)
+        self.close(wrapper)
+        other = self.open(self.wrapper('test_app'))
+        self.assertEqual(other.conn_params['database'], 'test_app')
+        self.assertEqual(self.connect.call_count, 2)
+        self.assertEqual(set(pool_module.pool_stats()), {'default', 'default#2'})
+
+    def test_isolation_level_is_applied_to_reused_connections(self):
+        wrapper = self.wrapper(options={'isolation_level': 3})
+        connection = self.open(wrapper)
+        self.close(wrapper)
+        connection.set_session.reset_mock()
+        self.assertIs(self.open(wrapper), connection)
+        connection.set_session.assert_called_once_with(isolation_level=3)
+        self.assertEqual(wrapper.isolation_level, 3)
+
+    def test_connection_that_fails_to_reset_is_discarded(self):
+        wrapper = self.wrapper()
+        connection = self.open(wrapper)
+        connection.reset.side_effect = Database.OperationalError('server closed the connection')
+        self.close(wrapper)
+        connection.close.assert_called_once_with()
+        self.assertIsNot(self.open(wrapper), connection)
+        self.assertEqual(wrapper._pool.stats()['connections_discarded'], 1)
+
+    def test_closed_connection_is_discarded(self):
+        wrapper = self.wrapper()
+        connection = self.open(wrapper)
+        connection.closed = 1
+        self.close(wrapper)
+        connection.reset.assert_not_called()
+        self.assertEqual(wrapper._pool.stats()['size'], 0)
+
+
+class SecretSettingsTests(SimpleTestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.cache_path = os.path.join(tmp_dir.name, '.django_settings.cache')
+        self.fetches = []
+
+    def fetch(self, settings_name):
+        self.fetches.append(settings_name)
+        return 'SECRET_KEY=from-secret-manager\n'
+
+    def test_payload_is_cached_on_disk(self):
+        for _ in range(3):
+            payload = load_secret_settings('django_settings', self.cache_path, 60, fetch=self.fetch)
+            self.assertEqual(payload, 'SECRET_KEY=from-secret-manager\n')
+        self.assertEqual(self.fetches, ['django_settings'])
+        self.assertEqual(stat.S_IMODE(os.stat(self.cache_path).st_mode), 0o600)
+
+    def test_expired_cache_is_refetched(self):
+        load_secret_settings('django_settings', self.cache_path, 60, fetch=self.fetch)
+        stale = time.time() - 120
+        os.utime(self.cache_path, (stale, stale))
+        load_secret_settings('django_settings', self.cache_path, 60, fetch=self.fetch)
+        self.assertEqual(len(self.fetches), 2)
+
+    def test_zero_ttl_disables_cache(self):
+        load_secret_settings('django_settings', self.cache_path, 0, fetch=self.fetch)
+        self.assertFalse(os.path.exists(self.cache_path))
+
+    def test_missing_credentials_are_not_cached(self):
+        self.assertIsNone(load_secret_settings('django_settings', self.cache_path, 60, fetch=lambda name: None))
+        self.assertFalse(os.path.exists(self.cache_path))
@@ -14,13 +14,14 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from functools import lru_cache
+
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include, re_path
 from django.views.generic.base import TemplateView
 from allauth.account.views import confirm_email
 from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
 
 urlpatterns = [
     path("", include("home.urls")),
@@ -40,19 +41,32 @@ admin.site.site_title = "Faulkner Scenario Test Admin Portal"
 admin.site.index_title = "Faulkner Scenario Test Admin"
 
 # swagger
-api_info = openapi.Info(
-    title="Faulkner Scenario Test API",
-    default_version="v1",
-    description="API documentation for Faulkner Scenario Test App",
-)
-
-schema_view = get_schema_view(
-    api_info,
-    public=True,
-    permission_classes=(permissions.IsAuthenticated,),
-)
-
-urlpatterns += [
-    path("api-docs/", schema_view.with_ui("swagger", cache_timeout=0), name="api_docs")
-]
+if settings.API_DOCS:
+    from drf_yasg import openapi
+
+    api_info = openapi.Info(
+        title="Faulkner Scenario Test API",
+        default_version="v1",
+        description="API documentation for Faulkner Scenario Test App",
+    )
+
+    @lru_cache(maxsize=None)
+    def get_api_docs_view():
+        # drf_yasg.views pulls in the whole schema generation stack; import it on the
+        # first docs request rather than in every process that loads the URLconf.
+        from drf_yasg.views import get_schema_view
+
+        schema_view = get_schema_view(
+            api_info,
+            public=True,
+            permission_classes=(permissions.IsAuthenticated,),
+        )
+        return schema_view.with_ui("swagger", cache_timeout=0)
+
+    def api_docs(request, *args, **kwargs):
+        return get_api_docs_view()(request, *args, **kwargs)
+
+    urlpatterns += [
+        path("api-docs/", api_docs, name="api_docs")
+    ]
 
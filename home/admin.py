@@ -1,3 +1,28 @@
 from django.contrib import admin
 
-# Register your models here.
+from home.models import App, Plan, Subscription
+
+
+@admin.register(App)
+class AppAdmin(admin.ModelAdmin):
+    list_display = ['name', 'user', 'app_type', 'framework', 'domain_name', 'app_subscription', 'created_at']
+    list_select_related = ['user', 'app_subscription__plan']
+    list_filter = ['app_type', 'framework']
+    search_fields = ['name', 'domain_name']
+    raw_id_fields = ['user', 'app_subscription']
+
+
+@admin.register(Plan)
+class PlanAdmin(admin.ModelAdmin):
+    list_display = ['name', 'description', 'price', 'updated_at']
+    search_fields = ['name']
+
+
+@admin.register(Subscription)
+class SubscriptionAdmin(admin.ModelAdmin):
+    list_display = ['id', 'subscription_app', 'plan', 'user', 'active', 'created_at']
+    list_select_related = ['subscription_app', 'plan', 'user']
+    list_filter = ['active']
+    search_fields = ['subscription_app__name']
+    raw_id_fields = ['user', 'subscription_app']
+    autocomplete_fields = ['plan']
@@ -0,0 +1,66 @@
+import copy
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from home.cache import LocalCache
+
+token_cache = LocalCache(
+    max_entries=settings.TOKEN_AUTH_LOCAL_CACHE_SIZE,
+    timeout=settings.TOKEN_AUTH_LOCAL_CACHE_TIMEOUT,
+)
+
+
+def get_token_cache_key(key):
+    # Tokens are credentials; keep them out of cache keys (and Redis KEYS output).
+    return "authtoken:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def invalidate_token(key):
+    cache_key = get_token_cache_key(key)
+    token_cache.delete(cache_key)
+    cache.delete(cache_key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that remembers key -> (user, token) instead of joining Token
+    and User on every request.
+
+    Lookups go to a process-local LRU first, then to the shared cache (Redis when
+    REDIS_URL is set), then to the database. home.signals invalidates an entry when
+    its token is deleted or its user is deactivated or changes password. Other
+    processes see an invalidation once their local entry expires, after
+    TOKEN_AUTH_LOCAL_CACHE_TIMEOUT seconds. The user is loaded without its password
+    hash, so the hash never reaches the cache; reading it costs a query.
+    """
+    def authenticate_credentials(self, key):
+        cache_key = get_token_cache_key(key)
+        entry = token_cache.get(cache_key)
+        if entry is None:
+            entry = cache.get(cache_key)
+            if entry is None:
+                entry = self.load_credentials(key)
+                cache.set(cache_key, entry, settings.TOKEN_AUTH_CACHE_TIMEOUT)
+            token_cache.set(cache_key, entry)
+
+        user, token = entry
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        # Views may mutate request.user; never hand out the cached instances.
+        user = copy.copy(user)
+        token = copy.copy(token)
+        token.user = user
+        return (user, token)
+
+    def load_credentials(self, key):
+        model = self.get_model()
+        try:
+            token = model.objects.select_related('user').defer('user__password').get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        return (token.user, token)
@@ -0,0 +1,378 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.functional import cached_property
+from django.utils.http import http_date, parse_etags
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from home.api.v1.renderers import FastJSONRenderer, PreEncodedJSON
+from home.api.v1.serializers import get_fast_read_serializer
+from home.cache import LocalCache, get_cache_version
+from home.export import EXPORT_FORMATS, stream_export
+from home.instrumentation import instrument, time_serializer
+
+
+class CachedResponseMixin:
+    """
+    Caches list and retrieve payloads of a read-mostly viewset.
+
+    Entries live in the shared cache (Redis when REDIS_URL is set) under a versioned
+    key, with a process-local tier in front so warm workers skip the payload
+    round-trip. Writers invalidate by bumping the namespace version (see
+    home.signals). Every cached response carries an ETag and a matching
+    If-None-Match is answered with 304.
+    """
+    cache_namespace = None
+    cache_timeout = settings.API_CACHE_TIMEOUT
+    local_cache = LocalCache()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_cache_key(self, request):
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        version = get_cache_version(self.cache_namespace)
+        return f"{self.cache_namespace}:{version}:json:{path}"
+
+    def cached_response(self, view, request, *args, **kwargs):
+        key = self.get_cache_key(request)
+        entry = self.local_cache.get(key)
+        if entry is None:
+            entry = cache.get(key)
+        if entry is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            # Entries hold the rendered JSON, so hits skip serializing and encoding.
+            body = FastJSONRenderer().render(response.data)
+            entry = (body, quote_etag(hashlib.md5(body).hexdigest()))
+            cache.set(key, entry, self.cache_timeout)
+        self.local_cache.set(key, entry)
+
+        body, etag = entry
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        if isinstance(request.accepted_renderer, FastJSONRenderer):
+            return Response(PreEncodedJSON(body), headers={'ETag': etag})
+        return Response(json.loads(body), headers={'ETag': etag})
+
+
+class BulkModelMixin:
+    """
+    Adds a `bulk/` list route that writes a batch of objects in one request.
+    POST creates every item; PUT/PATCH update the objects named by each item's `id`,
+    limited to the viewset's queryset. The serializer's list_serializer_class must be
+    a BulkListSerializer.
+    """
+    @action(detail=False, methods=['post', 'put', 'patch'], url_path='bulk')
+    def bulk(self, request):
+        if request.method == 'POST':
+            serializer = self.get_serializer(data=request.data, many=True)
+            serializer.is_valid(raise_exception=True)
+            # Stamped like single writes (see ConditionalRequestMixin) so ETags move.
+            serializer.save(updated_at=timezone.now())
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+        serializer = self.get_serializer(
+            self.get_queryset(),
+            data=request.data,
+            many=True,
+            partial=request.method == 'PATCH',
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save(updated_at=timezone.now())
+        return Response(serializer.data)
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "The object was modified since you last read it."
+    default_code = "precondition_failed"
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def microseconds(value):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+class ConditionalRequestMixin:
+    """
+    Conditional requests driven by `updated_at`. Detail responses carry an ETag and
+    Last-Modified of the object, list responses a fingerprint of the filtered
+    queryset (its count, max(pk) and max(updated_at)) and of the query parameters
+    that select the fields and page (see get_list_variant()). If-None-Match /
+    If-Modified-Since are checked against a values() query before anything is
+    serialized and answered with 304; If-Match / If-Unmodified-Since on PUT/PATCH
+    are checked against the locked row and answered with 412. Creates and updates
+    stamp `updated_at` with the server time, and new rows take a higher pk, so
+    every write moves the validators: a delete changes the count, and a delete
+    followed by a create still changes max(pk). Responses with expanded relations are left alone, since
+    the related rows have their own `updated_at`. Requires ExpandableViewMixin.
+    """
+    conditional_actions = ('retrieve', 'update', 'partial_update')
+    # Query parameters of DRF's paginators that select a page; the page size is
+    # taken from the paginator.
+    pagination_params = ('cursor_query_param', 'page_query_param', 'limit_query_param', 'offset_query_param')
+
+    def get_object(self):
+        self.conditional_object = super().get_object()
+        return self.conditional_object
+
+    def get_validators(self, pk, updated_at):
+        return quote_etag(f'{pk}.{microseconds(updated_at)}'), int(updated_at.timestamp())
+
+    def get_list_variant(self):
+        """
+        Digest of the query parameters that pick what a list response holds: the
+        ?fields= names (order and repeats aside) and the paginator's parameters, with
+        the page size as the paginator clamps it.
+        """
+        fields = self.field_options.get('fields')
+        params = [('fields', None if fields is None else sorted(set(fields)))]
+        paginator = self.paginator
+        for attr in self.pagination_params:
+            name = getattr(paginator, attr, None)
+            if name:
+                params.append((name, self.request.query_params.get(name)))
+        if hasattr(paginator, 'get_page_size'):
+            params.append(('page_size', paginator.get_page_size(self.request)))
+        return hashlib.md5(json.dumps(params).encode()).hexdigest()[:16]
+
+    def get_list_validators(self, queryset):
+        fingerprint = queryset.aggregate(count=Count('pk'), last_pk=Max('pk'), last_modified=Max('updated_at'))
+        last_modified = fingerprint['last_modified']
+        variant = self.get_list_variant()
+        if last_modified is None:
+            return quote_etag(f"{fingerprint['count']}.0.0.{variant}"), None
+        etag = quote_etag(f"{fingerprint['count']}.{fingerprint['last_pk']}.{microseconds(last_modified)}.{variant}")
+        return etag, int(last_modified.timestamp())
+
+    def get_object_validators(self, lock=False):
+        """Validators of the requested object from its `updated_at` alone, or None."""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        if lock:
+            queryset = queryset.select_for_update()
+        try:
+            row = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]}).values_list(
+                'pk', 'updated_at',
+            ).first()
+        except (TypeError, ValueError, DjangoValidationError):
+            return None
+        return row and self.get_validators(*row)
+
+    def is_conditional(self):
+        return not self.field_options.get('expand')
+
+    def check_preconditions(self, request, validators):
+        etag, last_modified = validators
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            return None
+        if response.status_code == status.HTTP_412_PRECONDITION_FAILED:
+            raise PreconditionFailed()
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=self.validator_headers(etag, last_modified))
+
+    def validator_headers(self, etag, last_modified):
+        headers = {'ETag': etag}
+        if last_modified is not None:
+            headers['Last-Modified'] = http_date(last_modified)
+        return headers
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_conditional():
+            return super().list(request, *args, **kwargs)
+        validators = self.get_list_validators(self.filter_queryset(self.get_queryset()))
+        response = self.check_preconditions(request, validators)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+            for header, value in self.validator_headers(*validators).items():
+                response[header] = value
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        meta = request.META
+        if self.is_conditional() and ('HTTP_IF_NONE_MATCH' in meta or 'HTTP_IF_MODIFIED_SINCE' in meta):
+            validators = self.get_object_validators()
+            response = validators and self.check_preconditions(request, validators)
+            if response:
+                return response
+        return super().retrieve(request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        meta = request.META
+        if 'HTTP_IF_MATCH' not in meta and 'HTTP_IF_UNMODIFIED_SINCE' not in meta:
+            return super().update(request, *args, **kwargs)
+        with transaction.atomic():
+            validators = self.get_object_validators(lock=True)
+            if validators:
+                self.check_preconditions(request, validators)
+            return super().update(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        serializer.save(updated_at=timezone.now())
+
+    def perform_update(self, serializer):
+        serializer.save(updated_at=timezone.now())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        instance = getattr(self, 'conditional_object', None)
+        if (instance is not None and self.action in self.conditional_actions
+                and response.status_code == status.HTTP_200_OK and self.is_conditional()):
+            validators = self.get_validators(instance.pk, instance.updated_at)
+            for header, value in self.validator_headers(*validators).items():
+                response[header] = value
+        return response
+
+
+class FastListMixin:
+    """
+    Serves list() from a values_list() projection formatted column by column (see
+    home.api.v1.serializers.FastReadSerializer) rather than from model instances run
+    through the serializer field by field. The JSON is the same. Lists with expanded
+    relations take the regular path. Requires ExpandableViewMixin.
+    """
+    fast_list = True
+
+    def list(self, request, *args, **kwargs):
+        options = self.field_options
+        if not self.fast_list or options.get('expand'):
+            return super().list(request, *args, **kwargs)
+
+        serializer = get_fast_read_serializer(self.get_serializer_class(), options.get('fields'))
+        queryset = self.filter_queryset(self.get_queryset())
+        # The paginator reads its ordering off the rows, whatever ?fields= asked for.
+        ordering = [name for name in self.get_pagination_ordering(queryset) if name not in serializer.columns]
+        queryset = queryset.values_list(*serializer.columns, *ordering, named=True)
+        page = self.paginate_queryset(queryset)
+        rows = queryset if page is None else page
+        with time_serializer():
+            data = serializer.represent(rows)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def get_pagination_ordering(self, queryset):
+        """The fields a cursor paginator orders the list by, without direction."""
+        if not hasattr(self.paginator, 'get_ordering'):
+            return []
+        return [name.lstrip('-') for name in self.paginator.get_ordering(self.request, queryset, self)]
+
+
+class ExportMixin:
+    """
+    Adds an `export/` list route that streams every object of the viewset's queryset
+    as NDJSON (the default), a JSON array or CSV, picked with ?export_format=. Rows
+    are encoded as they are read, see home.export.
+
+    The rows are queried while the response streams, after InstrumentationMiddleware
+    has recorded the request, so the endpoint's histograms show neither the export
+    query nor its SQL time. The streaming itself is recorded as the
+    `export.<resource>.<format>` step.
+    """
+    export_resource = None
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'export_format': [f"Choose one of: {', '.join(EXPORT_FORMATS)}."]})
+        chunks = stream_export(self.export_resource, export_format, self.get_queryset())
+        response = StreamingHttpResponse(
+            self.instrumented(chunks, f'export.{self.export_resource}.{export_format}'),
+            content_type=EXPORT_FORMATS[export_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{self.export_resource}.{export_format}"'
+        return response
+
+    @staticmethod
+    def instrumented(chunks, name):
+        with instrument(name):
+            yield from chunks
+
+
+class InstrumentedViewMixin:
+    """
+    Adds the time spent in the view's serializers (to_representation and
+    to_internal_value) to the request's serializer time, which
+    home.middleware.InstrumentationMiddleware reports.
+    """
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        for method in ('to_representation', 'to_internal_value'):
+            setattr(serializer, method, self.timed(getattr(serializer, method)))
+        return serializer
+
+    @staticmethod
+    def timed(method):
+        def wrapper(*args, **kwargs):
+            with time_serializer():
+                return method(*args, **kwargs)
+        return wrapper
+
+
+class ExpandableViewMixin:
+    """
+    Read requests take `?fields=id,name` to trim each object to the named fields and
+    `?expand=plan,user` to inline the named relations (the serializer's
+    get_expandable_fields()). The queryset joins exactly the relations that are
+    expanded, so an expanded list costs the same number of queries as a plain one.
+    Writes always use the full serializer.
+    """
+    def get_list_param(self, name):
+        value = self.request.query_params.get(name)
+        if value is None:
+            return None
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    @cached_property
+    def field_options(self):
+        if self.request.method not in SAFE_METHODS:
+            return {}
+        serializer_class = self.get_serializer_class()
+        fields = self.get_list_param('fields')
+        expand = self.get_list_param('expand') or []
+        errors = {}
+        if fields is not None:
+            unknown = sorted(set(fields) - set(serializer_class.Meta.fields))
+            if unknown:
+                errors['fields'] = [f"Unknown fields: {', '.join(unknown)}."]
+        unknown = sorted(set(expand) - set(serializer_class.get_expandable_fields()))
+        if unknown:
+            errors['expand'] = [f"Cannot expand: {', '.join(unknown)}."]
+        if errors:
+            raise ValidationError(errors)
+        return {
+            'fields': fields,
+            'expand': [name for name in expand if fields is None or name in fields],
+        }
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.update(self.field_options)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        expand = self.field_options.get('expand')
+        if expand:
+            queryset = queryset.select_related(*expand)
+        return queryset
@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class AppCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the App list. Pages are walked in (created_at, id) order so
+    each request reads a bounded slice off the (user, created_at, id) index instead of
+    serializing the whole table.
+    """
+    ordering = ('created_at', 'id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -0,0 +1,55 @@
+import json
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    # Optional: without it every payload goes through DRF's json.dumps path.
+    orjson = None
+
+
+class PreEncodedJSON(bytes):
+    """JSON rendered earlier (e.g. a cached payload) that FastJSONRenderer sends as is."""
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in JSONRenderer that renders with orjson when it is installed, to the same
+    bytes but for the floats noted below. orjson handles datetimes (Z for UTC, as DRF's encoder), UUIDs and
+    containers natively; everything else (Decimal, lazy strings, querysets...) goes
+    through DRF's encoder. Indented output, non-default UNICODE_JSON/COMPACT_JSON/
+    STRICT_JSON settings and data orjson rejects (e.g. non-string keys, integers
+    beyond 64 bits) fall back to the stdlib path.
+
+    The bytes differ from JSONRenderer's in two cases, which this renderer accepts
+    rather than scanning every payload for them (the API has no float fields):
+    floats below 1e-4 or from 1e16 up are written in orjson's form (0.00001, 1e16)
+    rather than Python's repr (1e-05, 1e+16), which parses to the same values; and
+    NaN and Infinity, which STRICT_JSON refuses to render, come out as null.
+
+    PreEncodedJSON data is returned without re-encoding.
+    """
+    # U+2028/U+2029 are escaped, like JSONRenderer does, so the output stays a
+    # strict JavaScript subset.
+    LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if isinstance(data, PreEncodedJSON):
+            if indent is None:
+                return bytes(data)
+            data = json.loads(data)
+        if orjson is None or indent is not None or not self.compact or self.ensure_ascii or not self.strict:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=orjson.OPT_UTC_Z)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        for separator, escaped in self.LINE_SEPARATORS:
+            if separator in ret:
+                ret = ret.replace(separator, escaped)
+        return ret
@@ -1,20 +1,44 @@
-from django.contrib.auth import get_user_model
-from django.http import HttpRequest
+import decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth import get_backends, get_user_model, user_login_failed
+from django.contrib.auth.backends import ModelBackend
 from django.utils.translation import ugettext_lazy as _
 from allauth.account import app_settings as allauth_settings
+from allauth.account.auth_backends import AuthenticationBackend as AllauthBackend
 from allauth.account.forms import ResetPasswordForm
-from allauth.utils import email_address_exists, generate_unique_username
+from allauth.account.models import EmailAddress
+from allauth.utils import generate_unique_username
 from allauth.account.adapter import get_adapter
-from allauth.account.utils import setup_user_email
+from django.core.exceptions import ImproperlyConfigured, ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Case, IntegerField, Q, When
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.authtoken.serializers import AuthTokenSerializer
+from rest_framework.settings import ISO_8601, api_settings
+from rest_framework.validators import UniqueValidator
 from rest_auth.serializers import PasswordResetSerializer
 
+from home.hashing import burn_password_hash, verify_password
+from home.instrumentation import instrument
 from home.models import App, Plan, Subscription
 
 
 User = get_user_model()
 
 
+EMAIL_TAKEN_MESSAGE = _("A user is already registered with this e-mail address.")
+USERNAME_CONFLICT_MESSAGE = _("Could not pick a username for this account, please try again.")
+SIGNUP_USERNAME_ATTEMPTS = 3
+
+
+def email_taken(email):
+    """Whether any user has `email` as their own or as an allauth EmailAddress, in one query."""
+    return User.objects.filter(Q(email__iexact=email) | Q(emailaddress__email__iexact=email)).exists()
+
+
 class SignupSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -32,35 +56,42 @@ class SignupSerializer(serializers.ModelSerializer):
             }
         }
 
-    def _get_request(self):
-        request = self.context.get('request')
-        if request and not isinstance(request, HttpRequest) and hasattr(request, '_request'):
-            request = request._request
-        return request
-
     def validate_email(self, email):
-        email = get_adapter().clean_email(email)
-        if allauth_settings.UNIQUE_EMAIL:
-            if email and email_address_exists(email):
-                raise serializers.ValidationError(
-                    _("A user is already registered with this e-mail address."))
+        # Stored lower-cased; users_user has a unique index on LOWER(email) to match.
+        email = get_adapter().clean_email(email).strip().lower()
+        with instrument('signup.validate_email'):
+            if allauth_settings.UNIQUE_EMAIL and email_taken(email):
+                raise serializers.ValidationError(EMAIL_TAKEN_MESSAGE)
         return email
 
     def create(self, validated_data):
-        user = User(
-            email=validated_data.get('email'),
-            name=validated_data.get('name'),
-            username=generate_unique_username([
-                validated_data.get('name'),
-                validated_data.get('email'),
-                'user'
-            ])
-        )
-        user.set_password(validated_data.get('password'))
-        user.save()
-        request = self._get_request()
-        setup_user_email(request, user, [])
-        return user
+        email = validated_data.get('email')
+        for attempt in range(1, SIGNUP_USERNAME_ATTEMPTS + 1):
+            with instrument('signup.generate_username'):
+                username = generate_unique_username([validated_data.get('name'), email, 'user'])
+            user = User(email=email, name=validated_data.get('name'), username=username)
+            user.set_password(validated_data.get('password'))
+            with instrument('signup.save'):
+                try:
+                    with transaction.atomic():
+                        user.save()
+                        # What setup_user_email() ends up writing for an API signup, minus
+                        # its existence checks and the session round-trip for a stashed
+                        # e-mail.
+                        EmailAddress.objects.create(user=user, email=email, primary=True, verified=False)
+                except IntegrityError:
+                    # Lost a race against a concurrent signup with the same e-mail or
+                    # the same generated username; the latter picks a new username.
+                    if allauth_settings.UNIQUE_EMAIL and email_taken(email):
+                        raise serializers.ValidationError({'email': [EMAIL_TAKEN_MESSAGE]})
+                    if not User.objects.filter(username=username).exists():
+                        raise
+                    if attempt == SIGNUP_USERNAME_ATTEMPTS:
+                        raise serializers.ValidationError({
+                            api_settings.NON_FIELD_ERRORS_KEY: [USERNAME_CONFLICT_MESSAGE],
+                        })
+                    continue
+            return user
 
     def save(self, request=None):
         """rest_auth passes request so we must override to accept it"""
@@ -73,32 +104,570 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'email', 'name']
 
 
+class LoginSerializer(AuthTokenSerializer):
+    """
+    AuthTokenSerializer with the password check moved to the hashing pool.
+
+    Accepts the identifiers of the configured AUTHENTICATION_BACKENDS: the username
+    for ModelBackend, and for allauth's backend whatever ACCOUNT_AUTHENTICATION_METHOD
+    allows, where an e-mail must be the user's own or a verified or primary
+    EmailAddress. The single best candidate is read with its token in one query, so
+    a login costs exactly one password hash; the backends' user_can_authenticate()
+    has the final say.
+    """
+    def validate(self, attrs):
+        username = attrs.get('username')
+        password = attrs.get('password')
+        user = get_login_candidate(username)
+        if user is None:
+            burn_password_hash(password)
+        elif verify_password(user, password) and user_can_authenticate(user):
+            attrs['user'] = user
+            return attrs
+        user_login_failed.send(
+            sender=__name__,
+            credentials={'username': username},
+            request=self.context.get('request'),
+        )
+        msg = _('Unable to log in with provided credentials.')
+        raise serializers.ValidationError(msg, code='authorization')
+
+
+def get_login_candidate(username):
+    """
+    The user `username` identifies for the configured backends, or None. Username
+    matches win over e-mail matches, as ModelBackend is tried first.
+    """
+    backends = get_backends()
+    allauth_backend = any(isinstance(backend, AllauthBackend) for backend in backends)
+    method = allauth_settings.AUTHENTICATION_METHOD
+    methods = allauth_settings.AuthenticationMethod
+    lookups = []
+    if any(isinstance(backend, ModelBackend) and not isinstance(backend, AllauthBackend) for backend in backends):
+        lookups.append(Q(username=username))
+    if allauth_backend and method != methods.EMAIL:
+        lookups.append(Q(username__iexact=username))
+    if allauth_backend and method != methods.USERNAME:
+        lookups.append(Q(email__iexact=username))
+        lookups.append(
+            Q(emailaddress__email__iexact=username)
+            & (Q(emailaddress__verified=True) | Q(emailaddress__primary=True))
+        )
+    if not lookups:
+        return None
+    query = Q()
+    for lookup in lookups:
+        query |= lookup
+    return User.objects.select_related('auth_token').filter(query).annotate(
+        username_match=Case(When(username=username, then=0), default=1, output_field=IntegerField()),
+    ).order_by('username_match', 'pk').first()
+
+
+def user_can_authenticate(user):
+    return all(
+        backend.user_can_authenticate(user)
+        for backend in get_backends()
+        if hasattr(backend, 'user_can_authenticate')
+    )
+
+
 class PasswordSerializer(PasswordResetSerializer):
     """Custom serializer for rest_auth to solve reset password error"""
     password_reset_form_class = ResetPasswordForm
 
 
-class AppSerializer(serializers.ModelSerializer):
+def get_unique_errors(model, unique_fields, items, pks):
+    """
+    Checks the `unique_fields` of every item against the table in a single query and
+    against each other. `items` are dicts of field values and `pks` the pk each item
+    will be saved over (None for new rows). Empty values are never duplicates, they
+    are stored as NULL. Returns one error dict per item.
+    """
+    errors = [{} for _ in items]
+    values = {
+        field: [item.get(field) or None for item in items]
+        for field in unique_fields
+        if any(field in item for item in items)
+    }
+    if not values:
+        return errors
+
+    query = Q()
+    for field, field_values in values.items():
+        query |= Q(**{f'{field}__in': {value for value in field_values if value is not None}})
+    existing = {field: {} for field in values}
+    for row in model.objects.filter(query).values('pk', *values):
+        for field in values:
+            existing[field][row[field]] = row['pk']
+
+    for field, field_values in values.items():
+        model_field = model._meta.get_field(field)
+        message = model_field.error_messages['unique'] % {
+            'model_name': model._meta.verbose_name,
+            'field_label': model_field.verbose_name,
+        }
+        seen = set()
+        for index, value in enumerate(field_values):
+            if value is None:
+                continue
+            owner_pk = existing[field].get(value)
+            if value in seen or (owner_pk is not None and owner_pk != pks[index]):
+                errors[index][field] = [message]
+            seen.add(value)
+    return errors
+
+
+CONFLICT_MESSAGE = "This object conflicts with an existing one."
+# psycopg2.errorcodes.UNIQUE_VIOLATION
+PG_UNIQUE_VIOLATION = '23505'
+SQLITE_UNIQUE_VIOLATION = 'UNIQUE constraint failed: '
+
+
+def get_unique_violation(exc):
+    """
+    What the unique violation behind IntegrityError `exc` names: the constraint on
+    PostgreSQL, the "table.column" list on SQLite. None for any other integrity
+    error (NOT NULL, foreign key...), which callers re-raise.
+    """
+    cause = exc.__cause__
+    pgcode = getattr(cause, 'pgcode', None)
+    if pgcode is not None:
+        return cause.diag.constraint_name if pgcode == PG_UNIQUE_VIOLATION else None
+    message = str(exc)
+    if message.startswith(SQLITE_UNIQUE_VIOLATION):
+        return message[len(SQLITE_UNIQUE_VIOLATION):]
+    return None
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolves pks from the lookups a parent BulkListSerializer fetched for the whole
+    batch in one query, instead of one query per item. Standalone serializers keep
+    the usual per-object lookup.
+    """
+    def to_internal_value(self, data):
+        prefetched = getattr(self.root, 'prefetched_related', {}).get(self.field_name)
+        if prefetched is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = self.get_queryset().model._meta.pk.to_python(data)
+        except DjangoValidationError:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return prefetched[pk]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    many=True serializer for batch writes. Related pks are resolved and the child's
+    `unique_fields` are checked with one query per batch rather than per item, rows
+    are written with bulk_create/bulk_update in a single transaction, and errors are
+    reported per item in input order.
+
+    For updates, `instance` is the queryset of objects the caller may modify and every
+    item carries the `id` of the object it targets; they are fetched with one in_bulk().
+    """
+    max_items = 1000
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list) or not data:
+            return super().to_internal_value(data)
+        if len(data) > self.max_items:
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [f"Ensure this batch has no more than {self.max_items} items."]
+            })
+
+        item_errors = [{} for _ in data]
+        if self.instance is not None:
+            self.instance_map = self.instance.in_bulk({self.get_item_pk(item) for item in data} - {None})
+            for item, errors in zip(data, item_errors):
+                if self.get_item_instance(item) is None:
+                    errors['id'] = ["Object does not exist or is not owned by the request user."]
+        self.prefetch_related_fields(data)
+        items = [item if isinstance(item, dict) else {} for item in data]
+        for errors, unique_errors in zip(item_errors, self.get_unique_errors(items)):
+            errors.update(unique_errors)
+
+        try:
+            validated_data = super().to_internal_value(data)
+        except serializers.ValidationError as exc:
+            if not isinstance(exc.detail, list):
+                raise
+            for errors, field_errors in zip(item_errors, exc.detail):
+                for field, detail in field_errors.items():
+                    errors.setdefault(field, detail)
+            raise serializers.ValidationError(item_errors)
+        if any(item_errors):
+            raise serializers.ValidationError(item_errors)
+        return validated_data
+
+    def get_item_pk(self, item):
+        if not isinstance(item, dict):
+            return None
+        try:
+            return self.child.Meta.model._meta.pk.to_python(item.get('id'))
+        except DjangoValidationError:
+            return None
+
+    def get_item_instance(self, item):
+        return self.instance_map.get(self.get_item_pk(item))
+
+    def get_unique_errors(self, items):
+        if self.instance is None:
+            pks = [None for _ in items]
+        else:
+            pks = [getattr(self.get_item_instance(item), 'pk', None) for item in self.initial_data]
+        return get_unique_errors(self.child.Meta.model, self.child.unique_fields, items, pks)
+
+    def prefetch_related_fields(self, data):
+        self.prefetched_related = {}
+        for field in self.child.fields.values():
+            if not isinstance(field, BulkPrimaryKeyRelatedField) or field.read_only:
+                continue
+            pk_field = field.get_queryset().model._meta.pk
+            pks = set()
+            for item in data:
+                try:
+                    pks.add(pk_field.to_python(item.get(field.field_name)))
+                except (AttributeError, TypeError, DjangoValidationError):
+                    continue
+            pks.discard(None)
+            self.prefetched_related[field.field_name] = field.get_queryset().in_bulk(pks)
+
+    def save(self, **kwargs):
+        # The batch was checked up front; a conflict here is a concurrent writer, which
+        # the constraints catch and we report like any other validation error.
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except IntegrityError as exc:
+            violation = get_unique_violation(exc)
+            if violation is None:
+                raise
+            errors = self.get_unique_errors(self.validated_data)
+            if not any(errors):
+                errors = self.child.get_conflict_errors(violation)
+            raise serializers.ValidationError(errors)
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        return model.objects.bulk_create([model(**attrs) for attrs in validated_data])
+
+    def update(self, instances, validated_data):
+        objs = [self.get_item_instance(item) for item in self.initial_data]
+        fields = set()
+        for obj, attrs in zip(objs, validated_data):
+            for attr, value in attrs.items():
+                setattr(obj, attr, value)
+            fields.update(attrs)
+        if fields:
+            self.child.Meta.model.objects.bulk_update(objs, fields)
+        return objs
+
+
+class BulkSerializerMixin:
+    """
+    ModelSerializer mixin for models written one at a time or in batches through
+    BulkListSerializer.
+
+    Per-field UniqueValidators (one EXISTS query each) are replaced by a check of all
+    `unique_fields` in a single query, per object or per batch. The database
+    constraints stay authoritative: a unique violation from a concurrent write is
+    turned into the same 400 response, or into the `conflict_errors` of the
+    violated constraint (keyed as get_unique_violation() names it).
+    """
+    serializer_related_field = BulkPrimaryKeyRelatedField
+    unique_fields = ()
+    conflict_errors = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for field_name, field in fields.items():
+            if field_name in self.unique_fields:
+                field.validators = [
+                    validator for validator in field.validators if not isinstance(validator, UniqueValidator)
+                ]
+        return fields
+
+    def get_unique_errors(self, attrs):
+        pk = getattr(self.instance, 'pk', None)
+        return get_unique_errors(self.Meta.model, self.unique_fields, [attrs], [pk])[0]
+
+    def get_conflict_errors(self, violation):
+        """The errors for a unique violation the up-front checks did not catch."""
+        return self.conflict_errors.get(violation, {api_settings.NON_FIELD_ERRORS_KEY: [CONFLICT_MESSAGE]})
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        # A parent BulkListSerializer checks the whole batch at once.
+        if self.unique_fields and not isinstance(self.parent, BulkListSerializer):
+            errors = self.get_unique_errors(attrs)
+            if errors:
+                raise serializers.ValidationError(errors)
+        return attrs
+
+    def save(self, **kwargs):
+        writes_unique_field = any(field in self.validated_data for field in self.unique_fields)
+        if not writes_unique_field or isinstance(self.parent, BulkListSerializer):
+            return super().save(**kwargs)
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except IntegrityError as exc:
+            violation = get_unique_violation(exc)
+            if violation is None:
+                raise
+            errors = self.get_unique_errors(self.validated_data)
+            raise serializers.ValidationError(errors or self.get_conflict_errors(violation))
+
+
+class ExpandableFieldsMixin:
+    """
+    ModelSerializer mixin for sparse fieldsets and inlined relations. `fields` limits
+    the output to the named fields and `expand` replaces the pks of the named
+    relations with the related objects, rendered by the serializers that
+    get_expandable_fields() maps them to. Fetching the expanded relations up front
+    is the view's job (see home.api.v1.mixins.ExpandableViewMixin).
+    """
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        expandable = self.get_expandable_fields()
+        for field_name in expand:
+            self.fields[field_name] = expandable[field_name](read_only=True)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+    @classmethod
+    def get_expandable_fields(cls):
+        return {}
+
+
+class AppSerializer(ExpandableFieldsMixin, BulkSerializerMixin, serializers.ModelSerializer):
+    unique_fields = ('name', 'domain_name')
+
     class Meta:
         model = App
         fields = ['id', 'name', 'description', 'app_type', 'framework', 'domain_name', 'screenshot', 'app_subscription', 'user', 'created_at', 'updated_at']  
+        # NOT NULL columns the client supplies (updated_at is stamped by the views).
+        extra_kwargs = {'created_at': {'required': True}}
+        list_serializer_class = BulkListSerializer
+
+    @classmethod
+    def get_expandable_fields(cls):
+        return {'user': UserSerializer, 'app_subscription': SubscriptionSerializer}
+
+    def validate_domain_name(self, domain_name):
+        # Empty domains are stored as NULL so they don't collide on the unique constraint.
+        return domain_name or None
 
 
-class PlanSerializer(serializers.ModelSerializer):
+class PlanSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Plan
         fields = ['id', 'name', 'description', 'price', 'created_at', 'updated_at'] 
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+ACTIVE_SUBSCRIPTION_MESSAGE = "This app already has an active subscription. Switch its plan instead."
+
+
+def changes_active_subscription(instance, attrs):
+    """
+    Whether writing `attrs` over the subscription `instance` (None when creating one)
+    can change which subscription is its app's active one.
+    """
+    if instance is None:
+        return attrs.get('active', True)
+    return 'active' in attrs or 'subscription_app' in attrs
+
+
+class SubscriptionListSerializer(BulkListSerializer):
+    """BulkListSerializer that keeps App.app_subscription in step with the batch."""
+
+    def create(self, validated_data):
+        subscriptions = super().create(validated_data)
+        App.sync_subscriptions({
+            subscription.subscription_app_id
+            for subscription, attrs in zip(subscriptions, validated_data)
+            if changes_active_subscription(None, attrs)
+        })
+        return subscriptions
+
+    def update(self, instances, validated_data):
+        # Read before the writes, for subscriptions moved to another app.
+        app_ids = {
+            self.get_item_instance(item).subscription_app_id
+            for item, attrs in zip(self.initial_data, validated_data)
+            if changes_active_subscription(self.get_item_instance(item), attrs)
+        }
+        subscriptions = super().update(instances, validated_data)
+        app_ids.update(
+            subscription.subscription_app_id
+            for subscription, attrs in zip(subscriptions, validated_data)
+            if changes_active_subscription(subscription, attrs)
+        )
+        App.sync_subscriptions(app_ids)
+        return subscriptions
+
+
+class SubscriptionSerializer(ExpandableFieldsMixin, BulkSerializerMixin, serializers.ModelSerializer):
+    # home_sub_one_active_per_app, as PostgreSQL and SQLite report it.
+    conflict_errors = {
+        violation: {'subscription_app': [ACTIVE_SUBSCRIPTION_MESSAGE]}
+        for violation in ('home_sub_one_active_per_app', 'home_subscription.subscription_app_id')
+    }
+
     class Meta:
         model = Subscription
         fields = ['id', 'user', 'plan', 'subscription_app', 'active', 'created_at', 'updated_at'] 
+        extra_kwargs = {'created_at': {'required': True}}
+        list_serializer_class = SubscriptionListSerializer
+
+    @classmethod
+    def get_expandable_fields(cls):
+        return {'user': UserSerializer, 'plan': PlanSerializer, 'subscription_app': AppSerializer}
+
+    def save(self, **kwargs):
+        # One active subscription per app is left to the database constraint, so the
+        # common writes cost no extra lookup. App.app_subscription follows in the same
+        # transaction.
+        if isinstance(self.parent, BulkListSerializer) or not changes_active_subscription(
+            self.instance, self.validated_data,
+        ):
+            return super().save(**kwargs)
+        previous_app_id = getattr(self.instance, 'subscription_app_id', None)
+        try:
+            with transaction.atomic():
+                subscription = super().save(**kwargs)
+                App.sync_subscriptions({previous_app_id, subscription.subscription_app_id} - {None})
+        except IntegrityError as exc:
+            violation = get_unique_violation(exc)
+            if violation is None:
+                raise
+            raise serializers.ValidationError(self.get_conflict_errors(violation))
+        return subscription
+
+
+class SwitchPlanSerializer(serializers.Serializer):
+    plan = serializers.PrimaryKeyRelatedField(queryset=Plan.objects.all())
+
+
+class FastReadSerializer:
+    """
+    Read-only, many=True rendering of a flat ModelSerializer from values_list() rows.
+
+    Produces the same data as `serializer_class(queryset, many=True).data` without
+    building model instances or calling to_representation per field per row: the
+    rows are transposed and each column is formatted in one pass. Columns whose
+    database value already is the representation (ids, strings, booleans, pks) are
+    passed through; datetimes and decimals get a specialised formatter and any
+    other field falls back to its own to_representation.
+    """
+    PASSTHROUGH_FIELDS = (
+        serializers.IntegerField,
+        serializers.CharField,
+        serializers.ChoiceField,
+        serializers.BooleanField,
+    )
+
+    def __init__(self, serializer_class, fields=None):
+        serializer = serializer_class()
+        model = serializer.Meta.model
+        self.names, self.columns, self.formatters = [], [], []
+        for name, field in serializer.fields.items():
+            if field.write_only or (fields is not None and name not in fields):
+                continue
+            if '.' in field.source or field.source == '*':
+                raise ImproperlyConfigured(f"{serializer_class.__name__}.{name} is not a plain model column.")
+            self.names.append(name)
+            self.columns.append(model._meta.get_field(field.source).attname)
+            self.formatters.append(self.get_formatter(field))
+
+    def get_formatter(self, field):
+        if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+            return None
+        if isinstance(field, serializers.DateTimeField):
+            output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+            if output_format is not None and output_format.lower() == ISO_8601 and not hasattr(field, 'timezone'):
+                return format_iso_datetimes
+        elif isinstance(field, serializers.DecimalField):
+            coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+            if coerce_to_string and not field.localize and field.decimal_places is not None:
+                return decimal_formatter(field)
+        elif isinstance(field, self.PASSTHROUGH_FIELDS):
+            return None
+        return lambda values: [field.to_representation(value) for value in values]
+
+    def represent(self, rows):
+        """
+        Formats an iterable of values_list(*self.columns) rows into a list of dicts.
+        Columns selected after self.columns are left out.
+        """
+        rows = list(rows)
+        if not rows:
+            return []
+        columns = list(zip(*rows))
+        for index, formatter in enumerate(self.formatters):
+            if formatter is not None:
+                columns[index] = format_column(formatter, columns[index])
+        names = self.names
+        return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def format_column(formatter, values):
+    """`values` run through a column formatter; None stays None, as in the serializers."""
+    if None not in values:
+        return formatter(values)
+    formatted = iter(formatter([value for value in values if value is not None]))
+    return [None if value is None else next(formatted) for value in values]
+
 
+def format_iso_datetimes(values):
+    # serializers.DateTimeField: converted to the current time zone, ISO 8601, UTC as Z.
+    tz = timezone.get_current_timezone() if settings.USE_TZ else None
+    formatted = []
+    for value in values:
+        if tz is not None and timezone.is_aware(value):
+            value = value.astimezone(tz)
+        elif tz is not None:
+            value = timezone.make_aware(value, tz)
+        elif timezone.is_aware(value):
+            value = timezone.make_naive(value, timezone.utc)
+        value = value.isoformat()
+        formatted.append(value[:-6] + 'Z' if value.endswith('+00:00') else value)
+    return formatted
 
 
+def decimal_formatter(field):
+    # serializers.DecimalField.quantize, with the exponent and context built once.
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
 
+    def format_decimals(values):
+        return [
+            '{:f}'.format(
+                (value if isinstance(value, decimal.Decimal) else decimal.Decimal(str(value).strip()))
+                .quantize(exponent, rounding=field.rounding, context=context)
+            )
+            for value in values
+        ]
+    return format_decimals
 
 
+def get_fast_read_serializer(serializer_class, fields=None):
+    """
+    FastReadSerializer of `serializer_class` limited to the validated field names in
+    `fields`, built once per set of names however the client ordered or repeated them.
+    """
+    return _build_fast_read_serializer(serializer_class, None if fields is None else tuple(sorted(set(fields))))
 
 
+@lru_cache(maxsize=256)
+def _build_fast_read_serializer(serializer_class, fields):
+    return FastReadSerializer(serializer_class, fields)
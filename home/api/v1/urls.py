@@ -7,6 +7,7 @@ from home.api.v1.viewsets import (
     AppViewSet,
     PlanViewSet,
     SubscriptionViewSet,
+    MetricsViewSet,
 )
 
 router = DefaultRouter()
@@ -15,6 +16,7 @@ router.register("login", LoginViewSet, basename="login")
 router.register("apps", AppViewSet, basename="apps")
 router.register("plans", PlanViewSet, basename="plans")
 router.register("subscriptions", SubscriptionViewSet, basename="subscriptions")
+router.register("metrics", MetricsViewSet, basename="metrics")
 
 urlpatterns = [
     path("", include(router.urls)),
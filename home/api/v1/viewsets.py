@@ -1,112 +1,128 @@
-from rest_framework.authtoken.serializers import AuthTokenSerializer
+from rest_framework.decorators import action
 from rest_framework.viewsets import ModelViewSet, ViewSet
 from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 
 from home.models import App, Plan, Subscription
 
 from home.api.v1.serializers import (
     SignupSerializer,
+    LoginSerializer,
     UserSerializer,
     AppSerializer,
     PlanSerializer,
     SubscriptionSerializer,
+    SwitchPlanSerializer,
 )
+from home.api.v1.mixins import (
+    BulkModelMixin,
+    CachedResponseMixin,
+    ConditionalRequestMixin,
+    ExpandableViewMixin,
+    ExportMixin,
+    FastListMixin,
+    InstrumentedViewMixin,
+)
+from home.api.v1.pagination import AppCursorPagination
+from home.cache import PLAN_CACHE_NAMESPACE
+from home.hashing import HashingPoolFull, hashing_pool
+from home.instrumentation import endpoint_stats, step_stats
+from faulkner_scenario_t_37790.db.pool import pool_stats
 
 
-class SignupViewSet(ModelViewSet):
+class SignupViewSet(InstrumentedViewMixin, ModelViewSet):
     serializer_class = SignupSerializer
     http_method_names = ["post"]
 
 
+class LoginUnavailable(APIException):
+    status_code = 503
+    default_detail = "Too many logins in progress, try again shortly."
+    default_code = "login_unavailable"
+
+
 class LoginViewSet(ViewSet):
     """Based on rest_framework.authtoken.views.ObtainAuthToken"""
 
-    serializer_class = AuthTokenSerializer
+    serializer_class = LoginSerializer
 
     def create(self, request):
         serializer = self.serializer_class(
             data=request.data, context={"request": request}
         )
-        serializer.is_valid(raise_exception=True)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except HashingPoolFull:
+            raise LoginUnavailable()
         user = serializer.validated_data["user"]
-        token, created = Token.objects.get_or_create(user=user)
+        try:
+            # Loaded along with the user; only a first login writes a token row.
+            token = user.auth_token
+        except Token.DoesNotExist:
+            token, created = Token.objects.get_or_create(user=user)
         user_serializer = UserSerializer(user)
         return Response({"token": token.key, "user": user_serializer.data})
 
-class PrimaryKeyException(Exception):
-    pass 
-
-class UserAuthException(Exception):
-    pass
-
-class AppViewSet(ModelViewSet):
+class AppViewSet(
+    InstrumentedViewMixin, ExpandableViewMixin, ConditionalRequestMixin, FastListMixin, BulkModelMixin, ExportMixin,
+    ModelViewSet,
+):
     serializer_class = AppSerializer
     http_method_names = ["get", "post", "put", "patch", "delete"]
+    permission_classes = [IsAuthenticated]
+    pagination_class = AppCursorPagination
     queryset = App.objects.all()
-
-    def retrieve(self, request, pk=None):
-        if pk == None:
-            raise PrimaryKeyException('Primary key is required for single App GET.')
-
-        requested_app = App.objects.get(id=pk)
-        if request.user == requested_app.user:
-            return super().retrieve(request, pk)
-        raise UserAuthException('Request User does not own app.')
-
-    def update(self, request, pk=None):
-        if pk == None:
-            raise PrimaryKeyException('Primary key is required for App POST.')
-
-        requested_app = App.objects.get(id=pk)
-        if request.user == requested_app.user:
-            return super().update(request, pk)
-        raise UserAuthException('Request User does not own app.')
-
-    def partial_update(self, request, pk=None):
-        if pk == None:
-            raise PrimaryKeyException('Primary key is required for App POST.')
-
-        requested_app = App.objects.get(id=pk)
-        if request.user == requested_app.user:
-            return super().partial_update(request, pk)
-        raise UserAuthException('Request User does not own app.')
-
-    def destroy(self, request, pk=None):
-        if pk == None:
-            raise PrimaryKeyException('Primary key is required for App POST.')
-
-        requested_app = App.objects.get(id=pk)
-        if request.user == requested_app.user:
-            return super().destroy(request, pk)
-        raise UserAuthException('Request User does not own app.') 
+    export_resource = 'apps'
+
+    def get_queryset(self):
+        # Ownership is enforced by the queryset itself: get_object() resolves the
+        # detail lookup with a single indexed query and non-owners get a 404.
+        return super().get_queryset().filter(user=self.request.user)
+
+    @action(detail=True, methods=['post'], url_path='switch-plan', serializer_class=SwitchPlanSerializer)
+    def switch_plan(self, request, pk=None):
+        """Deactivates the app's current subscription and subscribes it to `plan`."""
+        app = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        subscription = app.switch_plan(serializer.validated_data['plan'])
+        return Response(SubscriptionSerializer(subscription).data)
 
 
-class PlanViewSet(ModelViewSet):
+class PlanViewSet(InstrumentedViewMixin, ExpandableViewMixin, CachedResponseMixin, FastListMixin, ModelViewSet):
     serializer_class = PlanSerializer
     http_method_names = ["get"]
+    cache_namespace = PLAN_CACHE_NAMESPACE
     queryset = Plan.objects.all()
 
 
-class SubscriptionViewSet(ModelViewSet):
+class SubscriptionViewSet(
+    InstrumentedViewMixin, ExpandableViewMixin, ConditionalRequestMixin, FastListMixin, BulkModelMixin, ExportMixin,
+    ModelViewSet,
+):
     serializer_class = SubscriptionSerializer
     http_method_names = ["get", "post", "put", "patch"]
+    permission_classes = [IsAuthenticated]
     queryset = Subscription.objects.all()
+    export_resource = 'subscriptions'
+
+    def get_queryset(self):
+        # Ownership goes through Subscription.user, so update/partial_update cost one
+        # lookup plus the write; subscriptions owned by someone else are a 404.
+        return super().get_queryset().filter(user=self.request.user)
 
-    def update(self, request, pk=None):
-        if pk == None:
-            raise PrimaryKeyException('Primary key is required for App POST.')
 
-        requested_app = App.objects.get(id=pk)
-        if request.user == requested_app.user:
-            return super().update(request, pk)
-        raise UserAuthException('Request User does not own app.')
+class MetricsViewSet(ViewSet):
+    """Process-local runtime metrics of the worker serving the request."""
 
-    def partial_update(self, request, pk=None):
-        if pk == None:
-            raise PrimaryKeyException('Primary key is required for App POST.')
+    permission_classes = [IsAdminUser]
 
-        requested_app = App.objects.get(id=pk)
-        if request.user == requested_app.user:
-            return super().partial_update(request, pk)
-        raise UserAuthException('Request User does not own app.')
+    def list(self, request):
+        return Response({
+            "db_pool": pool_stats(),
+            "password_hashing": hashing_pool.stats(),
+            "steps": step_stats(),
+            "endpoints": endpoint_stats(),
+        })
@@ -0,0 +1,333 @@
+"""
+Throughput benchmarks for the home API and the infrastructure under it. They are not
+collected by the regular test run; run them explicitly with:
+
+    python manage.py test home.benchmarks
+"""
+import importlib
+import itertools
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from faulkner_scenario_t_37790.db.pool import ConnectionPool
+from faulkner_scenario_t_37790.secret_settings import load_secret_settings
+from home.api.v1.authentication import CachedTokenAuthentication
+from home.api.v1.renderers import FastJSONRenderer, orjson
+from home.api.v1.serializers import AppSerializer, SubscriptionSerializer, get_fast_read_serializer
+from home.factories import AppFactory, PlanFactory, SeedUserFactory, SubscriptionFactory
+from home.management.commands.profile_imports import profile_imports
+from home.models import App, Subscription
+import modules
+from modules.utils import OptionsRegistry, posixpath_to_modulepath
+from users.models import User
+
+
+def report(label, count, seconds, queries):
+    print(f"\n{label}: {count} objects in {seconds:.3f}s "
+          f"({count / seconds:.0f} objects/s, {queries} queries)")
+
+
+class BulkCreateBenchmark(TestCase):
+    batch_size = 500
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.get(name='testuser')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def app_payload(self, prefix):
+        return [
+            {
+                "name": f"{prefix} {i}",
+                "app_type": "Web",
+                "framework": "Django",
+                "domain_name": f"{prefix}{i}.com",
+                "user": self.user.id,
+                "created_at": "2022-12-05T06:08:02.325Z",
+                "updated_at": "2022-12-05T06:08:02.325Z"
+            }
+            for i in range(self.batch_size)
+        ]
+
+    def test_bulk_create_vs_per_object(self):
+        payload = self.app_payload('single')
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for item in payload:
+                self.client.post('/api/v1/apps/', item, format='json')
+            single = time.perf_counter() - start
+        report("POST /api/v1/apps/ per object", self.batch_size, single, len(queries))
+
+        payload = self.app_payload('bulk')
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = self.client.post('/api/v1/apps/bulk/', payload, format='json')
+            bulk = time.perf_counter() - start
+        report("POST /api/v1/apps/bulk/", self.batch_size, bulk, len(queries))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(App.objects.filter(name__startswith='bulk').count(), self.batch_size)
+        self.assertLess(bulk, single)
+
+
+class ConnectionPoolBenchmark(SimpleTestCase):
+    """
+    Simulated request loop against a local Postgres stand-in: an in-memory sqlite
+    connection behind an artificial connect latency (TCP + TLS + auth handshake).
+    """
+    connect_latency = 0.005
+    requests = 400
+    threads = 4
+
+    def connect(self):
+        time.sleep(self.connect_latency)
+        return sqlite3.connect(':memory:', check_same_thread=False)
+
+    def run_requests(self, handle_request):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(self.threads) as executor:
+            list(executor.map(lambda _: handle_request(), range(self.requests)))
+        return time.perf_counter() - start
+
+    def test_pooled_vs_per_request_connections(self):
+        def per_request():
+            conn = self.connect()
+            conn.execute('SELECT 1')
+            conn.close()
+
+        pool = ConnectionPool(max_size=self.threads)
+
+        def pooled():
+            conn = pool.checkout(self.connect)
+            conn.execute('SELECT 1')
+            pool.checkin(conn)
+
+        unpooled_seconds = self.run_requests(per_request)
+        print(f"\nconnect per request: {self.requests} requests in {unpooled_seconds:.3f}s "
+              f"({self.requests / unpooled_seconds:.0f} requests/s)")
+        pooled_seconds = self.run_requests(pooled)
+        print(f"pooled connections: {self.requests} requests in {pooled_seconds:.3f}s "
+              f"({self.requests / pooled_seconds:.0f} requests/s), {pool.stats()}")
+
+        self.assertLessEqual(pool.stats()['connections_created'], self.threads)
+        self.assertLess(pooled_seconds, unpooled_seconds)
+
+
+class SecretSettingsBenchmark(SimpleTestCase):
+    """
+    Settings start-up cost of the Secret Manager lookup, against a fake backend that
+    sleeps for a typical credentials probe + access_secret_version round trip.
+    """
+    rpc_latency = 0.25
+
+    def fake_fetch(self, settings_name):
+        time.sleep(self.rpc_latency)
+        return 'SECRET_KEY=benchmark\n'
+
+    def test_cached_vs_uncached_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_path = os.path.join(tmp_dir, '.django_settings.cache')
+            start = time.perf_counter()
+            load_secret_settings('django_settings', cache_path, 300, fetch=self.fake_fetch)
+            cold = time.perf_counter() - start
+            start = time.perf_counter()
+            load_secret_settings('django_settings', cache_path, 300, fetch=self.fake_fetch)
+            warm = time.perf_counter() - start
+        print(f"\nsecret settings: first process {cold * 1000:.1f}ms, cached {warm * 1000:.3f}ms")
+        self.assertLess(warm, cold / 10)
+
+    def test_settings_startup_without_google_imports(self):
+        # google.* libraries are imported only when a fetch actually happens.
+        code = (
+            "import sys, django; django.setup(); "
+            "print(any(name.startswith(('google.auth', 'google.cloud.secretmanager')) for name in sys.modules))"
+        )
+        env = dict(os.environ, SKIP_SECRET_MANAGER='1', DJANGO_SETTINGS_MODULE='faulkner_scenario_t_37790.settings')
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True)
+        print(f"\ndjango.setup() with SKIP_SECRET_MANAGER=1: {time.perf_counter() - start:.3f}s")
+        self.assertEqual(result.stdout.strip(), 'False', result.stderr)
+
+
+class StartupImportBenchmark(SimpleTestCase):
+    """Import time of `manage.py check`, against IMPORT_TIME_BUDGET_MS (default 1500)."""
+
+    def test_check_stays_within_import_budget(self):
+        env = dict(os.environ, SKIP_SECRET_MANAGER='1', DEBUG='False')
+        env.pop('DJANGO_EXTENSIONS', None)
+        modules = profile_imports(['check'], env=env)
+        total_ms = sum(module['self_us'] for module in modules) / 1000
+        print(f"\nmanage.py check: {len(modules)} modules imported in {total_ms:.1f}ms")
+        self.assertLess(total_ms, float(os.environ.get('IMPORT_TIME_BUDGET_MS', 1500)))
+
+
+class ModuleOptionsBenchmark(SimpleTestCase):
+    """
+    Per-call cost of reading a module option: the previous implementation, which parsed
+    options.json and globbed the project tree for options.py on every call, against
+    the OptionsRegistry lookup.
+    """
+    calls = 200
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.options_path = os.path.join(tmp.name, 'options.json')
+        with open(self.options_path, 'w') as f:
+            json.dump({'module_options': {'bench-articles': {'TITLE': ''}}}, f)
+        os.makedirs(os.path.join(tmp.name, 'bench_articles'))
+        with open(os.path.join(tmp.name, 'bench_articles', 'options.py'), 'w') as f:
+            f.write('TITLE = "Articles"\n')
+        patcher = mock.patch.object(modules, '__path__', modules.__path__ + [tmp.name])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.root = tmp.name
+
+    def legacy_get_options(self, module_slug, option_key):
+        with open(self.options_path, "r") as f:
+            option_value = json.loads(f.read())["module_options"][module_slug].get(option_key)
+        # The old lookup globbed from the working directory, i.e. the whole project.
+        pattern = f"**/{module_slug.replace('-', '_')}/**/options.py"
+        module_options_file = next(
+            itertools.chain(Path(settings.BASE_DIR).rglob(pattern), Path(self.root).rglob(pattern))
+        )
+        module_options_file = Path('modules') / module_options_file.relative_to(self.root)
+        default_value = getattr(importlib.import_module(posixpath_to_modulepath(module_options_file)), option_key)
+        return option_value if option_value else default_value
+
+    def time_calls(self, get_options):
+        start = time.perf_counter()
+        for _ in range(self.calls):
+            get_options('bench-articles', 'TITLE')
+        return (time.perf_counter() - start) / self.calls
+
+    def test_registry_vs_per_call_walk(self):
+        registry = OptionsRegistry(self.options_path, self.root)
+        legacy = self.time_calls(self.legacy_get_options)
+        cached = self.time_calls(registry.get_option)
+        print(f"\nget_options: per-call walk {legacy * 1e6:.1f}us/call, registry {cached * 1e6:.2f}us/call")
+        self.assertEqual(registry.get_option('bench-articles', 'TITLE'), 'Articles')
+        self.assertLess(cached, legacy / 10)
+
+
+class TokenAuthenticationBenchmark(TestCase):
+    lookups = 2000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.token = Token.objects.create(user=User.objects.get(name='testuser'))
+
+    def time_lookups(self, authentication):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(self.lookups):
+                authentication.authenticate_credentials(self.token.key)
+            seconds = time.perf_counter() - start
+        print(f"{type(authentication).__name__}: {seconds / self.lookups * 1e6:.1f}us/request, "
+              f"{len(queries)} queries for {self.lookups} requests")
+        return seconds
+
+    def test_cached_vs_uncached_token_lookup(self):
+        print()
+        uncached = self.time_lookups(TokenAuthentication())
+        cached = self.time_lookups(CachedTokenAuthentication())
+        self.assertLess(cached, uncached)
+
+
+class FastReadSerializerBenchmark(TestCase):
+    rows = 5000
+
+    @classmethod
+    def setUpTestData(cls):
+        user, plan = SeedUserFactory(), PlanFactory()
+        subscriptions = SubscriptionFactory.create_batch(cls.rows, subscription_app__user=user, plan=plan)
+        App.objects.bulk_update(
+            [subscription.subscription_app for subscription in subscriptions], ['app_subscription'],
+        )
+        for subscription in subscriptions:
+            subscription.subscription_app.app_subscription = subscription
+
+    def time_rows(self, label, fetch, serialize):
+        start = time.perf_counter()
+        rows = fetch()
+        fetched = time.perf_counter()
+        data = serialize(rows)
+        done = time.perf_counter()
+        print(f"{label}: {len(data) / (done - start):.0f} rows/s with the fetch, "
+              f"{len(data) / (done - fetched):.0f} rows/s serializing")
+        return data, done - fetched
+
+    def compare(self, model, serializer_class):
+        print()
+        fast_serializer = get_fast_read_serializer(serializer_class)
+        regular, regular_seconds = self.time_rows(
+            f"{serializer_class.__name__}(many=True)",
+            lambda: list(model.objects.order_by('pk')),
+            lambda instances: serializer_class(instances, many=True).data,
+        )
+        fast, fast_seconds = self.time_rows(
+            f"{serializer_class.__name__} fast path",
+            lambda: list(model.objects.order_by('pk').values_list(*fast_serializer.columns)),
+            fast_serializer.represent,
+        )
+        self.assertEqual(fast, regular)
+        self.assertLess(fast_seconds, regular_seconds / 3)
+
+    def test_apps(self):
+        self.compare(App, AppSerializer)
+
+    def test_subscriptions(self):
+        self.compare(Subscription, SubscriptionSerializer)
+
+
+class JSONRenderBenchmark(TestCase):
+    rows = 20000
+    renders = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        user = SeedUserFactory()
+        App.objects.bulk_create([AppFactory.build(user=user) for _ in range(cls.rows)])
+
+    def time_renders(self, renderer, data):
+        start = time.perf_counter()
+        for _ in range(self.renders):
+            body = renderer.render(data)
+        seconds = (time.perf_counter() - start) / self.renders
+        print(f"{type(renderer).__name__}: {len(data) / seconds:.0f} apps/s, {len(body) / seconds / 1e6:.1f} MB/s")
+        return body, seconds
+
+    def test_large_app_list(self):
+        # The list as the fast list path hands it to the renderer, and as the regular
+        # serializer does (OrderedDicts inside a ReturnList).
+        serializer = get_fast_read_serializer(AppSerializer)
+        for data in [
+            serializer.represent(App.objects.order_by('pk').values_list(*serializer.columns)),
+            AppSerializer(App.objects.order_by('pk'), many=True).data,
+        ]:
+            print()
+            body, regular = self.time_renders(JSONRenderer(), data)
+            fast_body, fast = self.time_renders(FastJSONRenderer(), data)
+            self.assertEqual(fast_body, body)
+            if orjson is not None:
+                self.assertLess(fast, regular / 2)
@@ -0,0 +1,68 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from uuid import uuid4
+
+from django.core.cache import cache
+
+PLAN_CACHE_NAMESPACE = "plans"
+
+
+def get_cache_version(namespace):
+    """
+    Current version token of a cache namespace. Cached entries embed it in their key,
+    so bumping the token orphans every entry of the namespace at once.
+    """
+    key = f"{namespace}:version"
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_cache_version(namespace):
+    # A fresh random token (rather than incr) can never collide with entries written
+    # under an older token that was evicted and re-created.
+    cache.set(f"{namespace}:version", uuid4().hex, None)
+
+
+class LocalCache:
+    """
+    Small thread-safe LRU used as a process-local tier in front of the shared cache.
+    Other processes cannot evict it, so keys must either be versioned or the entries
+    given a `timeout` (seconds) that bounds how long they can go stale.
+    """
+    def __init__(self, max_entries=256, timeout=None):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                return None
+            expires, value = self._entries[key]
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        expires = None if self.timeout is None else time.monotonic() + self.timeout
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,155 @@
+"""
+Streaming exports of apps and subscriptions.
+
+Rows are read with values() projections through .iterator(chunk_size=...) (a
+server-side cursor on PostgreSQL), formatted a chunk at a time and encoded one at a
+time, so memory stays flat whatever the table size. Datetimes and decimals are
+rendered exactly as the API renders them. Used by the `export/` routes of the App and Subscription
+APIs and by the export_data management command.
+"""
+import csv
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import DateTimeField, DecimalField, F
+from rest_framework import serializers
+
+from home.api.v1.serializers import decimal_formatter, format_column, format_iso_datetimes
+from home.models import App, Subscription
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+    'csv': 'text/csv',
+}
+
+# Output column -> model field path. Billing reconciliation needs the plan price next
+# to each subscription, so it is joined in rather than looked up per row.
+EXPORT_COLUMNS = {
+    'apps': {
+        'id': 'id',
+        'name': 'name',
+        'app_type': 'app_type',
+        'framework': 'framework',
+        'domain_name': 'domain_name',
+        'user_id': 'user_id',
+        'subscription_id': 'app_subscription_id',
+        'plan_name': 'app_subscription__plan__name',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    },
+    'subscriptions': {
+        'id': 'id',
+        'user_id': 'user_id',
+        'app_id': 'subscription_app_id',
+        'plan_id': 'plan_id',
+        'plan_name': 'plan__name',
+        'plan_price': 'plan__price',
+        'active': 'active',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    },
+}
+
+EXPORT_QUERYSETS = {
+    'apps': App.objects.all(),
+    'subscriptions': Subscription.objects.all(),
+}
+
+
+def get_model_field(model, path):
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def get_formatters(resource):
+    """Column -> formatter of the export columns whose API representation differs from the value."""
+    model = EXPORT_QUERYSETS[resource].model
+    formatters = {}
+    for column, path in EXPORT_COLUMNS[resource].items():
+        field = get_model_field(model, path)
+        if isinstance(field, DateTimeField):
+            formatters[column] = format_iso_datetimes
+        elif isinstance(field, DecimalField):
+            # What ModelSerializer builds for the field.
+            formatters[column] = decimal_formatter(
+                serializers.DecimalField(max_digits=field.max_digits, decimal_places=field.decimal_places),
+            )
+    return formatters
+
+
+def iter_rows(resource, queryset=None, chunk_size=None):
+    """Export rows of `resource` as dicts keyed by column, in pk order."""
+    columns = EXPORT_COLUMNS[resource]
+    if queryset is None:
+        queryset = EXPORT_QUERYSETS[resource]
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    # Columns named after their field are selected as is; the others are aliased
+    # (an alias may not shadow a model field).
+    rows = queryset.order_by('pk').values(
+        *[path for column, path in columns.items() if column == path],
+        **{column: F(path) for column, path in columns.items() if column != path},
+    ).iterator(chunk_size=chunk_size)
+    formatters = get_formatters(resource)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        for column, formatter in formatters.items():
+            for row, value in zip(chunk, format_column(formatter, [row[column] for row in chunk])):
+                row[column] = value
+        yield from chunk
+
+
+class Echo:
+    """File-like object whose write() hands the written line back to csv.writer."""
+    def write(self, value):
+        return value
+
+
+def encode_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def encode_json(rows):
+    separator = '['
+    for row in rows:
+        yield separator + json.dumps(row, cls=DjangoJSONEncoder)
+        separator = ',\n'
+    yield '[]\n' if separator == '[' else ']\n'
+
+
+# Spreadsheets evaluate cells starting with these as formulas.
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def escape_formula(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def encode_csv(rows, columns):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(escape_formula(row[column]) for column in columns)
+
+
+def encode(rows, export_format, columns):
+    if export_format == 'csv':
+        return encode_csv(rows, columns)
+    if export_format == 'json':
+        return encode_json(rows)
+    return encode_ndjson(rows)
+
+
+def stream_export(resource, export_format='ndjson', queryset=None, chunk_size=None):
+    """Encoded chunks (one per row) of an export of `resource`."""
+    rows = iter_rows(resource, queryset, chunk_size)
+    return encode(rows, export_format, list(EXPORT_COLUMNS[resource]))
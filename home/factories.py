@@ -0,0 +1,52 @@
+from django.utils import timezone
+from factory import Faker, Iterator, LazyAttribute, LazyFunction, SelfAttribute, Sequence, SubFactory
+from factory.django import DjangoModelFactory
+
+from home.models import App, Plan, Subscription
+from users.tests.factories import UserFactory
+
+
+class SeedUserFactory(UserFactory):
+    """UserFactory for bulk seeding: unique usernames and no per-user password hash."""
+    username = Sequence(lambda n: f"seed_user_{n}")
+    email = LazyAttribute(lambda o: f"{o.username}@example.com")
+    password = "!"
+
+
+class PlanFactory(DjangoModelFactory):
+    name = Sequence(lambda n: f"Plan {n}")
+    description = Faker("sentence")
+    price = Faker("pydecimal", left_digits=3, right_digits=2, positive=True)
+    created_at = LazyFunction(timezone.now)
+    updated_at = SelfAttribute("created_at")
+
+    class Meta:
+        model = Plan
+        django_get_or_create = ["name"]
+
+
+class AppFactory(DjangoModelFactory):
+    name = Sequence(lambda n: f"app-{n}")
+    description = Faker("sentence")
+    app_type = Iterator([choice for choice, _ in App.APP_TYPE_CHOICES])
+    framework = Iterator([choice for choice, _ in App.FRAMEWORK_CHOICES])
+    domain_name = LazyAttribute(lambda o: f"{o.name}.example.com")
+    screenshot = LazyAttribute(lambda o: f"https://{o.domain_name}/screenshot.png")
+    user = SubFactory(SeedUserFactory)
+    created_at = LazyFunction(timezone.now)
+    updated_at = SelfAttribute("created_at")
+
+    class Meta:
+        model = App
+
+
+class SubscriptionFactory(DjangoModelFactory):
+    subscription_app = SubFactory(AppFactory)
+    user = SelfAttribute("subscription_app.user")
+    plan = SubFactory(PlanFactory)
+    active = True
+    created_at = LazyFunction(timezone.now)
+    updated_at = SelfAttribute("created_at")
+
+    class Meta:
+        model = Subscription
@@ -0,0 +1,101 @@
+"""
+Bounded worker pool for password hashing.
+
+PBKDF2 runs in C with the GIL released, so a handful of login requests can saturate
+every core and starve the other request threads of the process. Routing hashes through
+`hashing_pool` caps how many run at once (PASSWORD_HASHING_WORKERS) and how many may
+wait for a worker (PASSWORD_HASHING_QUEUE). Past that, submissions fail fast with
+HashingPoolFull instead of piling up behind each other.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+
+class HashingPoolFull(Exception):
+    pass
+
+
+class HashingPool:
+    def __init__(self, workers, max_queue):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='password-hashing')
+        self._slots = BoundedSemaphore(workers + max_queue)
+        self._lock = Lock()
+        self._pending = 0
+        self.metrics = {
+            'submitted': 0,
+            'completed': 0,
+            'rejected': 0,
+            'queue_wait_seconds_total': 0.0,
+            'queue_wait_seconds_max': 0.0,
+            'hash_seconds_total': 0.0,
+        }
+
+    def run(self, func, *args):
+        """Runs `func(*args)` on a pool worker and returns its result."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.metrics['rejected'] += 1
+            raise HashingPoolFull(
+                f"Password hashing queue is full ({self.workers} workers, {self.max_queue} queued)."
+            )
+        with self._lock:
+            self._pending += 1
+            self.metrics['submitted'] += 1
+        try:
+            return self._executor.submit(self._timed, time.monotonic(), func, *args).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+
+    def _timed(self, submitted_at, func, *args):
+        started_at = time.monotonic()
+        try:
+            return func(*args)
+        finally:
+            finished_at = time.monotonic()
+            waited = started_at - submitted_at
+            with self._lock:
+                self.metrics['completed'] += 1
+                self.metrics['queue_wait_seconds_total'] += waited
+                self.metrics['queue_wait_seconds_max'] = max(self.metrics['queue_wait_seconds_max'], waited)
+                self.metrics['hash_seconds_total'] += finished_at - started_at
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'pending': self._pending,
+                'queued': max(self._pending - self.workers, 0),
+                **self.metrics,
+            }
+
+
+hashing_pool = HashingPool(settings.PASSWORD_HASHING_WORKERS, settings.PASSWORD_HASHING_QUEUE)
+
+
+def verify_password(user, raw_password):
+    """
+    User.check_password() with the hash computed on the hashing pool. A hash that
+    needs upgrading is re-encoded on the pool too and saved from the calling thread,
+    which owns the database connection.
+    """
+    must_update = []
+    if not hashing_pool.run(check_password, raw_password, user.password, must_update.append):
+        return False
+    if must_update:
+        user.password = hashing_pool.run(make_password, raw_password)
+        user.save(update_fields=['password'])
+    return True
+
+
+def burn_password_hash(raw_password):
+    # Same cost as a real check, so unknown usernames can't be told apart by timing.
+    hashing_pool.run(make_password, raw_password)
@@ -0,0 +1,194 @@
+"""
+Request and step instrumentation.
+
+- `instrument("<path>.<step>")` records the wall time and query count of a block of
+  code. Each step is also logged at DEBUG on the `home.instrumentation` logger.
+- `RequestMetrics` collects the query count, SQL time and serializer time of the
+  request being served. home.middleware.InstrumentationMiddleware sets it up per
+  request and folds it into per-endpoint histograms.
+
+All aggregates are process-local and reported by /api/v1/metrics/.
+"""
+import bisect
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger('home.slow_queries')
+
+_steps = {}
+_steps_lock = Lock()
+
+
+@contextmanager
+def instrument(name):
+    queries = 0
+
+    def count_queries(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        with connection.execute_wrapper(count_queries):
+            yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with _steps_lock:
+            stats = _steps.setdefault(name, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'queries': 0})
+            stats['count'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['queries'] += queries
+        logger.debug("%s: %.1fms, %d queries", name, elapsed_ms, queries)
+
+
+def step_stats():
+    """Aggregates of every instrumented step run by this process, keyed by name."""
+    with _steps_lock:
+        return {name: dict(stats) for name, stats in _steps.items()}
+
+
+class Histogram:
+    """Fixed-bucket histogram; percentiles are reported as the bucket's upper bound."""
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent):
+        rank = percent / 100 * self.count
+        seen = 0
+        for i, bucket in enumerate(self.buckets):
+            seen += bucket
+            if bucket and seen >= rank:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return 0.0
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 3),
+            'max': round(self.max, 3),
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+        }
+
+
+MS_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.serializer_ms = 0.0
+
+    def record_query(self, execute, sql, params, many, context):
+        """django.db execute_wrapper that times every query of the request."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.queries += 1
+            self.sql_ms += elapsed_ms
+            if settings.SLOW_QUERY_MS is not None and elapsed_ms >= settings.SLOW_QUERY_MS:
+                log_slow_query(sql, elapsed_ms)
+
+
+current_request = ContextVar('current_request_metrics', default=None)
+
+_endpoints = {}
+_endpoints_lock = Lock()
+
+
+def record_request(endpoint, metrics, total_ms):
+    with _endpoints_lock:
+        histograms = _endpoints.get(endpoint)
+        if histograms is None:
+            histograms = _endpoints[endpoint] = {
+                'latency_ms': Histogram(MS_BUCKETS),
+                'sql_ms': Histogram(MS_BUCKETS),
+                'serializer_ms': Histogram(MS_BUCKETS),
+                'queries': Histogram(QUERY_BUCKETS),
+            }
+        histograms['latency_ms'].observe(total_ms)
+        histograms['sql_ms'].observe(metrics.sql_ms)
+        histograms['serializer_ms'].observe(metrics.serializer_ms)
+        histograms['queries'].observe(metrics.queries)
+
+
+def endpoint_stats():
+    """Histogram summaries per endpoint ("<METHOD> <url name>") served by this process."""
+    with _endpoints_lock:
+        return {
+            endpoint: {name: histogram.summary() for name, histogram in histograms.items()}
+            for endpoint, histograms in _endpoints.items()
+        }
+
+
+@contextmanager
+def time_serializer():
+    metrics = current_request.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_ms += (time.perf_counter() - start) * 1000
+
+
+# Where a slow query is attributed: the API view method on the stack (the handler of
+# the current action when it is there), and the innermost frame of project code, as
+# opposed to Django, DRF or the stdlib.
+ATTRIBUTION_VIEW_MODULE = 'home.api.v1.viewsets'
+PROJECT_DIR = os.path.join(settings.BASE_DIR, '')
+INSTRUMENTATION_FILES = {__file__, os.path.join(os.path.dirname(__file__), 'middleware.py')}
+
+
+def attribute_query():
+    view, location = None, None
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if location is None and code.co_filename.startswith(PROJECT_DIR) and \
+                code.co_filename not in INSTRUMENTATION_FILES and 'site-packages' not in code.co_filename:
+            location = f"{os.path.relpath(code.co_filename, PROJECT_DIR)}:{frame.f_lineno} in {code.co_name}"
+        instance = frame.f_locals.get('self')
+        if instance is not None and type(instance).__module__ == ATTRIBUTION_VIEW_MODULE:
+            method = f"{type(instance).__name__}.{code.co_name}"
+            if code.co_name == getattr(instance, 'action', None):
+                return method, location
+            view = view or method
+        frame = frame.f_back
+    return view, location
+
+
+def log_slow_query(sql, elapsed_ms):
+    view, location = attribute_query()
+    source = view or 'outside the API views'
+    if location:
+        source += f" ({location})"
+    slow_query_logger.warning("Slow query (%.1fms) from %s: %s", elapsed_ms, source, sql)
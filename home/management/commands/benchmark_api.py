@@ -0,0 +1,251 @@
+import json
+import os
+import time
+from itertools import cycle
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_databases, teardown_databases
+from rest_framework.test import APIClient
+
+from home.export import EXPORT_FORMATS, EXPORT_QUERYSETS, stream_export
+from home.factories import AppFactory, PlanFactory, SeedUserFactory, SubscriptionFactory
+from home.management.commands.loadtest_login import percentile
+from home.models import App, Plan, Subscription
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, "home", "benchmark_baseline.json")
+BATCH_SIZE = 5000
+
+
+def batches(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def seed(users, apps, subscriptions, plans=3):
+    """
+    Seeds `apps` apps spread over `users` users, and `subscriptions` subscriptions
+    spread over those apps. Each app's newest subscription is its active
+    app_subscription. Returns the seeded users.
+    """
+    users = SeedUserFactory.create_batch(users)
+    plans = PlanFactory.create_batch(plans)
+    last_app_id = App.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+    # Batches only bound memory; bulk_create splits them further to what the
+    # database backend accepts per statement.
+    for batch in batches(range(apps)):
+        App.objects.bulk_create([AppFactory.build(user=users[i % len(users)]) for i in batch])
+    app_list = list(App.objects.filter(id__gt=last_app_id).order_by("id"))
+
+    latest = {}
+    for batch in batches(range(subscriptions)):
+        rows = []
+        for i in batch:
+            app = app_list[i % len(app_list)]
+            rows.append(SubscriptionFactory.build(
+                subscription_app=app, user=app.user, plan=plans[i % len(plans)],
+                active=i + len(app_list) >= subscriptions,
+            ))
+        Subscription.objects.bulk_create(rows)
+    for subscription_id, app_id in Subscription.objects.filter(
+        subscription_app_id__gt=last_app_id, active=True,
+    ).values_list("id", "subscription_app_id"):
+        latest[app_id] = subscription_id
+    for app in app_list:
+        app.app_subscription_id = latest.get(app.id)
+    App.objects.bulk_update(app_list, ["app_subscription"], batch_size=1000)
+    return users
+
+
+def measure(client, requests, method, paths, payloads=None):
+    """
+    Latency percentiles (ms) and the highest query count over `requests` calls. An
+    extra first call warms up caches and is only counted for its queries.
+    """
+    latencies, queries = [], 0
+    paths = cycle(paths)
+    for i in range(requests + 1):
+        kwargs = {"format": "json"}
+        if payloads:
+            kwargs["data"] = payloads(i)
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = getattr(client, method)(next(paths), **kwargs)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        if response.status_code >= 400:
+            raise CommandError(f"{method.upper()} {response.request['PATH_INFO']}: {response.status_code} {response.data}")
+        queries = max(queries, len(captured))
+        if i:
+            latencies.append(elapsed_ms)
+    latencies.sort()
+    return {
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "queries": queries,
+    }
+
+
+def measure_export(resource, export_format):
+    """Rows per second of a full-table export, encoding included."""
+    rows = EXPORT_QUERYSETS[resource].count()
+    with CaptureQueriesContext(connection) as captured:
+        start = time.perf_counter()
+        for _ in stream_export(resource, export_format):
+            pass
+        elapsed = time.perf_counter() - start
+    return {"rows": rows, "rows_per_sec": round(rows / elapsed), "queries": len(captured)}
+
+
+def run_exports():
+    return {
+        f"{resource}.{export_format}": measure_export(resource, export_format)
+        for resource in ("apps", "subscriptions")
+        for export_format in EXPORT_FORMATS
+    }
+
+
+def run_benchmarks(user, requests):
+    client = APIClient()
+    client.force_authenticate(user)
+    app_ids = list(App.objects.filter(user=user).values_list("id", flat=True)[:requests])
+    subscription_ids = list(Subscription.objects.filter(user=user).values_list("id", flat=True)[:requests])
+    plan_ids = list(Plan.objects.values_list("id", flat=True))
+    run_id = time.time_ns()
+
+    def new_app(i):
+        return {
+            "name": f"bench-{run_id}-{i}"[:50], "app_type": "Web", "framework": "Django",
+            "user": user.id, "created_at": "2022-12-05T06:08:02Z", "updated_at": "2022-12-05T06:08:02Z",
+        }
+
+    def new_subscription(i):
+        return {
+            "user": user.id, "plan": plan_ids[i % len(plan_ids)], "subscription_app": app_ids[i % len(app_ids)],
+            "active": False, "created_at": "2022-12-05T06:08:02Z", "updated_at": "2022-12-05T06:08:02Z",
+        }
+
+    # Plans are read-only through the API, so only list and detail are timed.
+    return {
+        "apps.list": measure(client, requests, "get", ["/api/v1/apps/"]),
+        "apps.detail": measure(client, requests, "get", [f"/api/v1/apps/{pk}/" for pk in app_ids]),
+        "apps.create": measure(client, requests, "post", ["/api/v1/apps/"], new_app),
+        "apps.update": measure(
+            client, requests, "patch", [f"/api/v1/apps/{pk}/" for pk in app_ids],
+            lambda i: {"description": f"updated {i}"},
+        ),
+        "plans.list": measure(client, requests, "get", ["/api/v1/plans/"]),
+        "plans.detail": measure(client, requests, "get", [f"/api/v1/plans/{pk}/" for pk in plan_ids]),
+        "subscriptions.list": measure(client, requests, "get", ["/api/v1/subscriptions/"]),
+        "subscriptions.detail": measure(
+            client, requests, "get", [f"/api/v1/subscriptions/{pk}/" for pk in subscription_ids],
+        ),
+        "subscriptions.create": measure(client, requests, "post", ["/api/v1/subscriptions/"], new_subscription),
+        "subscriptions.update": measure(
+            client, requests, "patch", [f"/api/v1/subscriptions/{pk}/" for pk in subscription_ids],
+            lambda i: {"active": False},
+        ),
+    }
+
+
+def find_regressions(results, baseline, threshold, min_delta_ms):
+    """
+    Query counts may never grow. Latency and export throughput are compared only when
+    the baseline was taken on the same dataset and database backend; latency must
+    exceed both the relative threshold and an absolute noise floor.
+    """
+    regressions = []
+    same_dataset = (results["dataset"], results["database"]) == (baseline.get("dataset"), baseline.get("database"))
+    for name, current in results["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if previous is None:
+            continue
+        if current["queries"] > previous["queries"]:
+            regressions.append(f"{name}: {current['queries']} queries (baseline {previous['queries']})")
+        if not same_dataset:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            limit = previous[key] * (1 + threshold)
+            if current[key] > limit and current[key] - previous[key] > min_delta_ms:
+                regressions.append(f"{name}: {key} {current[key]:.1f} (baseline {previous[key]:.1f})")
+    if same_dataset:
+        for name, current in results.get("exports", {}).items():
+            previous = baseline.get("exports", {}).get(name)
+            if previous is not None and current["rows_per_sec"] * (1 + threshold) < previous["rows_per_sec"]:
+                regressions.append(
+                    f"export {name}: {current['rows_per_sec']} rows/s (baseline {previous['rows_per_sec']})"
+                )
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a large dataset into a throwaway test database, time list/detail/create/update "
+        "of the home API and the streaming exports, and compare query counts, p50/p95 "
+        "latencies and export rows/s with a JSON baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--apps", type=int, default=100000)
+        parser.add_argument("--subscriptions", type=int, default=500000)
+        parser.add_argument("--requests", type=int, default=50, help="Requests per endpoint.")
+        parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file.")
+        parser.add_argument(
+            "--update-baseline", action="store_true",
+            help="Write this run's results to the baseline instead of comparing against it.",
+        )
+        parser.add_argument(
+            "--threshold", type=float, default=0.5,
+            help="Allowed relative latency increase over the baseline (default 0.5 = +50%%).",
+        )
+        parser.add_argument(
+            "--min-delta-ms", type=float, default=5.0,
+            help="Latency increases below this many milliseconds are treated as noise.",
+        )
+        parser.add_argument(
+            "--use-existing-db", action="store_true",
+            help="Seed into the configured database instead of creating a test database.",
+        )
+
+    def handle(self, *args, **options):
+        old_config = None
+        if not options["use_existing_db"]:
+            old_config = setup_databases(verbosity=0, interactive=False, keepdb=False)
+        try:
+            start = time.perf_counter()
+            users = seed(options["users"], options["apps"], options["subscriptions"])
+            self.stdout.write(f"Seeded dataset in {time.perf_counter() - start:.1f}s")
+            endpoints = run_benchmarks(users[0], options["requests"])
+            exports = run_exports()
+        finally:
+            if old_config is not None:
+                teardown_databases(old_config, verbosity=0)
+
+        results = {
+            "dataset": {key: options[key] for key in ("users", "apps", "subscriptions", "requests")},
+            "database": connection.vendor,
+            "endpoints": endpoints,
+            "exports": exports,
+        }
+        for name, stats in endpoints.items():
+            self.stdout.write(
+                f"{name:<22} p50 {stats['p50_ms']:8.2f}ms  p95 {stats['p95_ms']:8.2f}ms  {stats['queries']} queries"
+            )
+        for name, stats in exports.items():
+            self.stdout.write(f"export {name:<20} {stats['rows']} rows  {stats['rows_per_sec']:>9} rows/s")
+
+        if options["update_baseline"] or not os.path.exists(options["baseline"]):
+            with open(options["baseline"], "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+                f.write("\n")
+            self.stdout.write(f"Wrote baseline {options['baseline']}")
+            return
+
+        with open(options["baseline"]) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, options["threshold"], options["min_delta_ms"])
+        if regressions:
+            raise CommandError("Performance regressions against the baseline:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
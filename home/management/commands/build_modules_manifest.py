@@ -0,0 +1,29 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from modules.manifest import MANIFEST_PATH, build_manifest, discover_modules
+
+
+class Command(BaseCommand):
+    help = "Rediscover installed modules and rewrite modules/manifest.json."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check", action="store_true",
+            help="Exit with an error instead of writing if the manifest is out of date.",
+        )
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            # read_manifest() would quietly rebuild a stale file; compare contents instead.
+            with open(MANIFEST_PATH) as f:
+                current = json.load(f)
+            if current != discover_modules():
+                raise CommandError(f"{MANIFEST_PATH} is out of date, run build_modules_manifest.")
+            return
+        manifest = build_manifest()
+        self.stdout.write(
+            f"Wrote {MANIFEST_PATH}: {len(manifest['apps'])} apps, "
+            f"{len(manifest['urls'])} URLconfs, {len(manifest['admins'])} admin modules."
+        )
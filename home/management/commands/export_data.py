@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from home.export import EXPORT_COLUMNS, EXPORT_FORMATS, EXPORT_QUERYSETS, encode, iter_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream every app or subscription (with its plan's name and price) as NDJSON, "
+        "a JSON array or CSV. Rows are written as they are read, so memory stays flat."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("resource", choices=sorted(EXPORT_COLUMNS))
+        parser.add_argument("--export-format", choices=list(EXPORT_FORMATS), default="ndjson")
+        parser.add_argument("--output", "-o", help="File to write to. Defaults to stdout.")
+        parser.add_argument("--chunk-size", type=int, help="Rows per database round-trip (EXPORT_CHUNK_SIZE).")
+        parser.add_argument("--user", type=int, help="Only export rows owned by this user id.")
+
+    def handle(self, *args, **options):
+        resource = options["resource"]
+        queryset = EXPORT_QUERYSETS[resource]
+        if options["user"] is not None:
+            queryset = queryset.filter(user_id=options["user"])
+
+        exported = 0
+
+        def counted(rows):
+            nonlocal exported
+            for row in rows:
+                exported += 1
+                yield row
+
+        rows = counted(iter_rows(resource, queryset, options["chunk_size"]))
+        chunks = encode(rows, options["export_format"], list(EXPORT_COLUMNS[resource]))
+        start = time.perf_counter()
+        if options["output"]:
+            with open(options["output"], "w", newline="") as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+        elapsed = time.perf_counter() - start
+        self.stderr.write(f"Exported {exported} {resource} in {elapsed:.2f}s ({exported / elapsed if elapsed else 0:.0f} rows/s)")
@@ -1,27 +1,132 @@
+import functools
 import json
-import subprocess
+import re
 
 import django
+from django.contrib.admindocs.views import simplify_regex
+from django.core.exceptions import ViewDoesNotExist
 from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from django.urls import URLPattern, URLResolver, get_resolver
+
+# Same decorator detection as django_extensions' show_urls, whose JSON this report
+# used to embed.
+REPORTED_DECORATORS = ["login_required"]
+
+
+def iter_url_patterns(urlpatterns, base="", namespace=None):
+    """Yields (callback, regex, name) for every view reachable from `urlpatterns`."""
+    for p in urlpatterns:
+        if isinstance(p, URLPattern):
+            try:
+                callback = p.callback
+            except ViewDoesNotExist:
+                continue
+            name = f"{namespace}:{p.name}" if p.name and namespace else p.name
+            yield callback, base + str(p.pattern), name
+        elif isinstance(p, URLResolver):
+            try:
+                patterns = p.url_patterns
+            except ImportError:
+                continue
+            if namespace and p.namespace:
+                _namespace = f"{namespace}:{p.namespace}"
+            else:
+                _namespace = p.namespace or namespace
+            yield from iter_url_patterns(patterns, base + str(p.pattern), _namespace)
+
+
+def describe_view(callback, regex, name):
+    func_globals = getattr(callback, "__globals__", {})
+    decorators = [d for d in REPORTED_DECORATORS if d in func_globals]
+    if isinstance(callback, functools.partial):
+        callback = callback.func
+        decorators.insert(0, "functools.partial")
+    if hasattr(callback, "__name__"):
+        func_name = callback.__name__
+    elif hasattr(callback, "__class__"):
+        func_name = "%s()" % callback.__class__.__name__
+    else:
+        func_name = re.sub(r" at 0x[0-9a-f]+", "", repr(callback))
+    return {
+        "url": simplify_regex(regex),
+        "module": f"{callback.__module__}.{func_name}",
+        "name": name or "",
+        "decorators": ", ".join(decorators),
+    }
+
+
+def iter_urls():
+    for callback, regex, name in iter_url_patterns(get_resolver().url_patterns):
+        yield describe_view(callback, regex, name)
+
+
+def describe_model(model, cursor):
+    table = model._meta.db_table
+    stats = {"model": model._meta.label, "table": table, "rows": None, "indexes": []}
+    if model._meta.swapped or not model._meta.managed:
+        return stats
+    try:
+        cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(table)}")
+        stats["rows"] = cursor.fetchone()[0]
+        constraints = connection.introspection.get_constraints(cursor, table)
+    except DatabaseError:
+        # Unmigrated table; report the model without stats.
+        return stats
+    stats["indexes"] = [
+        {
+            "name": name,
+            "columns": constraint["columns"],
+            "primary_key": constraint["primary_key"],
+            "unique": constraint["unique"],
+        }
+        for name, constraint in sorted(constraints.items())
+        if constraint["index"] or constraint["primary_key"] or constraint["unique"]
+    ]
+    return stats
 
 
 class Command(BaseCommand):
     help = "Generate a json with all Models and URLs of the project."
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stream", action="store_true",
+            help="Write the report incrementally, one URL and model at a time.",
+        )
+
     def handle(self, *args, **options):
         models = django.apps.apps.get_models(
             include_auto_created=True, include_swapped=True
         )
-        cmd = "python3 manage.py show_urls --format=json"
-        loc = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE)
-        print(
-            json.dumps(
-                {
-                    "models": [
-                        str(model).split(".")[-1].replace("'", "").strip(">")
-                        for model in models
-                    ],
-                    "urls": json.loads(loc.stdout.decode().strip()),
-                }
-            )
-        )
+        model_names = [
+            str(model).split(".")[-1].replace("'", "").strip(">")
+            for model in models
+        ]
+        with connection.cursor() as cursor:
+            model_stats = (describe_model(model, cursor) for model in models)
+            if options["stream"]:
+                self.stream_report(model_names, iter_urls(), model_stats)
+            else:
+                self.stdout.write(
+                    json.dumps(
+                        {
+                            "models": model_names,
+                            "urls": list(iter_urls()),
+                            "model_stats": list(model_stats),
+                        }
+                    )
+                )
+
+    def stream_report(self, model_names, urls, model_stats):
+        # Produces the same document as the buffered mode without holding it in memory.
+        write = functools.partial(self.stdout.write, ending="")
+        write('{"models": %s, "urls": [' % json.dumps(model_names))
+        for i, url in enumerate(urls):
+            write((", " if i else "") + json.dumps(url))
+            self.stdout.flush()
+        write('], "model_stats": [')
+        for i, stats in enumerate(model_stats):
+            write((", " if i else "") + json.dumps(stats))
+            self.stdout.flush()
+        write("]}\n")
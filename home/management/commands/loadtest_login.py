@@ -0,0 +1,105 @@
+import json
+import math
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+
+from home.hashing import hashing_pool
+
+LOGIN_PATH = "/api/v1/login/"
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class Command(BaseCommand):
+    help = f"Load test {LOGIN_PATH} and report latency percentiles and throughput."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", required=True)
+        parser.add_argument("--password", required=True)
+        parser.add_argument("--requests", type=int, default=200, help="Total number of logins.")
+        parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent clients.")
+        parser.add_argument(
+            "--url",
+            help="Base URL of a running server (e.g. http://localhost:8000). "
+                 "Without it, requests go through the Django test client in this process.",
+        )
+
+    def handle(self, *args, **options):
+        payload = {"username": options["username"], "password": options["password"]}
+        send = self.http_sender(options["url"], payload) if options["url"] else self.in_process_sender(payload)
+
+        latencies = []
+        statuses = Counter()
+        lock = threading.Lock()
+        concurrency = max(options["concurrency"], 1)
+
+        def worker(count):
+            try:
+                for _ in range(count):
+                    start = time.perf_counter()
+                    status = send()
+                    elapsed = time.perf_counter() - start
+                    with lock:
+                        latencies.append(elapsed)
+                        statuses[status] += 1
+            finally:
+                if not options["url"] and concurrency > 1:
+                    connection.close()
+
+        counts = [options["requests"] // concurrency + (i < options["requests"] % concurrency) for i in range(concurrency)]
+        start = time.perf_counter()
+        if concurrency == 1:
+            worker(counts[0])
+        else:
+            threads = [threading.Thread(target=worker, args=(count,)) for count in counts]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        duration = time.perf_counter() - start
+
+        latencies.sort()
+        self.stdout.write(
+            f"{len(latencies)} logins, concurrency {concurrency}, {duration:.2f}s, "
+            f"{len(latencies) / duration:.1f} logins/s"
+        )
+        self.stdout.write(
+            "latency p50 {:.1f}ms  p90 {:.1f}ms  p99 {:.1f}ms  max {:.1f}ms".format(
+                *(percentile(latencies, p) * 1000 for p in (50, 90, 99, 100))
+            )
+        )
+        self.stdout.write("status codes: " + ", ".join(f"{code}={n}" for code, n in sorted(statuses.items())))
+        if not options["url"]:
+            self.stdout.write(f"password hashing pool: {json.dumps(hashing_pool.stats())}")
+
+    def in_process_sender(self, payload):
+        def send():
+            return Client().post(LOGIN_PATH, payload).status_code
+        return send
+
+    def http_sender(self, base_url, payload):
+        url = base_url.rstrip("/") + LOGIN_PATH
+        body = json.dumps(payload).encode()
+
+        def send():
+            request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+            try:
+                with urllib.request.urlopen(request) as response:
+                    response.read()
+                    return response.status
+            except urllib.error.HTTPError as e:
+                return e.code
+        return send
@@ -0,0 +1,86 @@
+import json
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def parse_importtime(output):
+    """
+    Parses the stderr of `python -X importtime` into one dict per imported module with
+    its own and cumulative import time in microseconds and its nesting depth.
+    """
+    modules = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            modules.append({
+                "module": module,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                "depth": len(indent) // 2,
+            })
+    return modules
+
+
+def profile_imports(args, env=None):
+    """Runs `manage.py <args>` in a fresh interpreter and returns its parsed import times."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "manage.py", *args],
+        cwd=settings.BASE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    if result.returncode:
+        raise CommandError(f"manage.py {' '.join(args)} exited with {result.returncode}:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+class Command(BaseCommand):
+    help = "Report per-module import time of a cold `manage.py <command>` start."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "args", nargs="*", metavar="command",
+            help="manage.py command line to profile (default: check).",
+        )
+        parser.add_argument(
+            "--sort", choices=["cumulative", "self"], default="cumulative",
+            help="Rank modules by cumulative (default) or own import time.",
+        )
+        parser.add_argument(
+            "--group", action="store_true",
+            help="Aggregate own import time per top-level package.",
+        )
+        parser.add_argument("--limit", type=int, default=25, help="Number of rows to show.")
+        parser.add_argument("--json", action="store_true", help="Output JSON instead of a table.")
+
+    def handle(self, *args, **options):
+        modules = profile_imports(list(args) or ["check"])
+        total_us = sum(module["self_us"] for module in modules)
+
+        if options["group"]:
+            packages = defaultdict(int)
+            for module in modules:
+                packages[module["module"].split(".")[0]] += module["self_us"]
+            rows = [{"module": name, "self_us": us} for name, us in packages.items()]
+            key = "self_us"
+        else:
+            rows = modules
+            key = f"{options['sort']}_us"
+        rows = sorted(rows, key=lambda row: row[key], reverse=True)[:options["limit"]]
+
+        if options["json"]:
+            self.stdout.write(json.dumps({"total_us": total_us, "modules": len(modules), "top": rows}))
+            return
+        self.stdout.write(f"{len(modules)} modules imported in {total_us / 1000:.1f}ms")
+        for row in rows:
+            self.stdout.write(f"{row[key] / 1000:10.1f}ms  {row['module']}")
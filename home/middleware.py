@@ -0,0 +1,53 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.functional import empty
+
+from home.instrumentation import RequestMetrics, current_request, record_request
+
+
+class InstrumentationMiddleware:
+    """
+    Records query count, SQL time, serializer time (see
+    home.api.v1.mixins.InstrumentedViewMixin) and total latency of every request into
+    per-endpoint histograms. With SERVER_TIMING enabled, or for staff users, the
+    numbers of the request are also returned in a Server-Timing header. The user is
+    only looked at if the view already loaded it, so that check costs no queries.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics.record_query))
+                response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        total_ms = (time.perf_counter() - start) * 1000
+
+        record_request(self.get_endpoint(request), metrics, total_ms)
+        if settings.SERVER_TIMING or self.is_staff(request):
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={metrics.sql_ms:.1f};desc="{metrics.queries} queries"',
+                f'serialize;dur={metrics.serializer_ms:.1f}',
+                f'total;dur={total_ms:.1f}',
+            ])
+        return response
+
+    def get_endpoint(self, request):
+        match = getattr(request, 'resolver_match', None)
+        return f"{request.method} {match.view_name if match else 'unresolved'}"
+
+    def is_staff(self, request):
+        user = getattr(request, 'user', None)
+        # AuthenticationMiddleware's lazy user, never resolved by the view.
+        if getattr(user, '_wrapped', None) is empty:
+            return False
+        return bool(user is not None and user.is_staff)
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 11:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0003_auto_20221205_0548'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='app',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='home_app_user_created_id_idx'),
+        ),
+    ]
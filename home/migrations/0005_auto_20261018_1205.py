@@ -0,0 +1,32 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+def empty_domain_names_to_null(apps, schema_editor):
+    """
+    Empty domains become NULL so they no longer collide on the unique constraint.
+    """
+    App = apps.get_model('home', 'App')
+    App.objects.filter(domain_name='').update(domain_name=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0004_auto_20261018_1159'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='app',
+            name='domain_name',
+            field=models.CharField(blank=True, db_index=True, max_length=50, null=True),
+        ),
+        migrations.RunPython(empty_domain_names_to_null,
+            reverse_code=migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='app',
+            constraint=models.UniqueConstraint(condition=models.Q(_negated=True, domain_name=''), fields=('domain_name',), name='home_app_domain_name_uniq'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:29
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0005_auto_20261018_1205'),
+    ]
+
+    operations = [
+        # The composite index is in place before the single-column user index goes.
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='home_sub_user_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(condition=models.Q(active=True), fields=['subscription_app'], name='home_sub_active_app_idx'),
+        ),
+        migrations.AlterField(
+            model_name='app',
+            name='app_type',
+            field=models.CharField(choices=[('Web', 'Web'), ('Mobile', 'Mobile')], max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='app',
+            name='domain_name',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='app',
+            name='framework',
+            field=models.CharField(choices=[('Django', 'Django'), ('React Native', 'React Native')], max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='app',
+            name='name',
+            field=models.CharField(max_length=50, unique=True, validators=[django.core.validators.MinLengthValidator(1)]),
+        ),
+        migrations.AlterField(
+            model_name='app',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='plan',
+            name='name',
+            field=models.CharField(max_length=20, unique=True, validators=[django.core.validators.MinLengthValidator(1)]),
+        ),
+        migrations.AlterField(
+            model_name='subscription',
+            name='active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AlterField(
+            model_name='subscription',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
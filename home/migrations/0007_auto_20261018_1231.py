@@ -0,0 +1,47 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:31
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def deactivate_duplicate_active_subscriptions(apps, schema_editor):
+    """
+    Keeps one active subscription per app: the one the app points to when it is
+    active, otherwise the newest.
+    """
+    App = apps.get_model('home', 'App')
+    Subscription = apps.get_model('home', 'Subscription')
+    duplicated = (
+        Subscription.objects.filter(active=True)
+        .values('subscription_app')
+        .annotate(active_count=Count('id'))
+        .filter(active_count__gt=1)
+        .values_list('subscription_app', flat=True)
+    )
+    for app in App.objects.filter(pk__in=list(duplicated)):
+        active = Subscription.objects.filter(subscription_app=app, active=True)
+        if active.filter(pk=app.app_subscription_id).exists():
+            keep = app.app_subscription_id
+        else:
+            keep = active.latest('created_at', 'id').pk
+        active.exclude(pk=keep).update(active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0006_auto_20261018_1229'),
+    ]
+
+    operations = [
+        migrations.RunPython(deactivate_duplicate_active_subscriptions,
+            reverse_code=migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='subscription',
+            constraint=models.UniqueConstraint(condition=models.Q(active=True), fields=('subscription_app',), name='home_sub_one_active_per_app'),
+        ),
+        migrations.RemoveIndex(
+            model_name='subscription',
+            name='home_sub_active_app_idx',
+        ),
+    ]
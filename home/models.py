@@ -1,6 +1,18 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.core.validators import MinLengthValidator
+from django.utils import timezone
+
+
+def related_or_id(instance, field_name):
+    """
+    The related object when it is already loaded (e.g. via select_related), otherwise
+    its id, so string rendering never triggers a lazy foreign key query.
+    """
+    field = instance._meta.get_field(field_name)
+    if field.is_cached(instance):
+        return getattr(instance, field_name)
+    return f"#{getattr(instance, field.attname)}"
 
 
 class App(models.Model):
@@ -30,19 +42,84 @@ class App(models.Model):
     ]
     readonly_fields=('created_at', )
 
-    name = models.CharField(max_length=50, db_index=True, unique=True, validators=[MinLengthValidator(1)])
+    name = models.CharField(max_length=50, unique=True, validators=[MinLengthValidator(1)])
     description = models.CharField(max_length=255, blank=True)
-    app_type = models.CharField(max_length=255, db_index=True, choices=APP_TYPE_CHOICES)
-    framework=models.CharField(max_length=255, db_index=True, choices=FRAMEWORK_CHOICES)
-    domain_name = models.CharField(max_length=50, db_index=True, unique=True, blank=True)
+    app_type = models.CharField(max_length=255, choices=APP_TYPE_CHOICES)
+    framework=models.CharField(max_length=255, choices=FRAMEWORK_CHOICES)
+    # Looked up through home_app_domain_name_uniq.
+    domain_name = models.CharField(max_length=50, blank=True, null=True)
     screenshot = models.CharField(max_length=255, blank=True)
-    app_subscription = models.ForeignKey('home.Subscription', unique=True, db_index=True, blank=True, null=True, on_delete=models.CASCADE)
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE) # PROTECT?
+    # Points at the active subscription; switch_plan() and sync_subscriptions() keep
+    # the two in step.
+    app_subscription = models.ForeignKey('home.Subscription', unique=True, blank=True, null=True, on_delete=models.CASCADE)
+    # Covered by home_app_user_created_id_idx.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, db_index=False, on_delete=models.CASCADE) # PROTECT?
     created_at = models.DateTimeField(blank=True)
     updated_at = models.DateTimeField(blank=True)
 
+    class Meta:
+        indexes = [
+            # Owner-scoped, keyset-paginated App list.
+            models.Index(fields=['user', 'created_at', 'id'], name='home_app_user_created_id_idx'),
+        ]
+        constraints = [
+            # Apps without a domain store NULL; only real domains must be unique.
+            models.UniqueConstraint(
+                fields=['domain_name'],
+                condition=~models.Q(domain_name=''),
+                name='home_app_domain_name_uniq',
+            ),
+        ]
+
+    def get_current_subscription(self):
+        """
+        The app's active subscription with its plan, or None. One lookup on the
+        one-active-per-app unique index, however long the app's history grows.
+        """
+        return Subscription.objects.select_related('plan').filter(subscription_app=self, active=True).first()
+
+    def switch_plan(self, plan):
+        """
+        Moves the app to `plan`: the current subscription is deactivated and a new one
+        created and set as app_subscription, in a single transaction. The app row is
+        locked first so concurrent switches of the same app run one after the other.
+        Switching to the current plan changes nothing.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            App.objects.select_for_update().values_list('pk').get(pk=self.pk)
+            current = self.get_current_subscription()
+            if current is not None and current.plan_id == plan.pk:
+                return current
+            if current is not None:
+                Subscription.objects.filter(pk=current.pk).update(active=False, updated_at=now)
+            subscription = Subscription.objects.create(
+                user_id=self.user_id, plan=plan, subscription_app=self, active=True, created_at=now, updated_at=now,
+            )
+            App.objects.filter(pk=self.pk).update(app_subscription=subscription, updated_at=now)
+        self.app_subscription = subscription
+        self.updated_at = now
+        return subscription
+
+    @classmethod
+    def sync_subscriptions(cls, app_ids, now=None):
+        """
+        Points app_subscription of the apps `app_ids` at their active subscription, or
+        None, after subscriptions were written other than through switch_plan(). Run
+        it in the transaction of those writes.
+        """
+        apps = cls.objects.filter(pk__in=app_ids)
+        now = now or timezone.now()
+        if len(app_ids) > 1:
+            # A subscription moved between two of these apps must leave the first
+            # before the unique column lets the second point at it.
+            apps.exclude(app_subscription=None).update(app_subscription=None, updated_at=now)
+        active = Subscription.objects.filter(subscription_app=models.OuterRef('pk'), active=True)
+        apps.update(app_subscription=models.Subquery(active.values('pk')[:1]), updated_at=now)
+
     def __str__(self):
-        return f"App: {self.name} - {self.description} \n\tUser: {self.user} \n\t{self.app_subscription}"
+        return (f"App: {self.name} - {self.description} \n\tUser: {related_or_id(self, 'user')} "
+                f"\n\tSubscription: {self.app_subscription_id}")
 
 
 class Plan(models.Model):
@@ -58,7 +135,7 @@ class Plan(models.Model):
     """
     readonly_fields=('created_at', )
 
-    name = models.CharField(max_length=20, db_index=True, unique=True, validators=[MinLengthValidator(1)])
+    name = models.CharField(max_length=20, unique=True, validators=[MinLengthValidator(1)])
     description = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=21, decimal_places=8)
     created_at = models.DateTimeField(blank=True)
@@ -71,7 +148,8 @@ class Plan(models.Model):
 class Subscription(models.Model):
     """
     Subscription tracks what plan is associated with an app. For record keeping
-    subscriptions are never deleted, their active attribute is set to False.
+    subscriptions are never deleted, their active attribute is set to False. An app
+    has at most one active subscription; App.switch_plan() moves it to another plan.
 
     id
     user=<User>
@@ -83,15 +161,32 @@ class Subscription(models.Model):
     """
     readonly_fields=('created_at', 'subscription_app')
 
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, db_index=True, blank=True, on_delete=models.CASCADE)
+    # Covered by home_sub_user_created_id_idx.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, db_index=False, blank=True, on_delete=models.CASCADE)
     plan = models.ForeignKey('home.Plan', db_index=True, on_delete=models.PROTECT) # CASCADE?
     subscription_app = models.ForeignKey('home.App', db_index=True, on_delete=models.CASCADE)
-    active = models.BooleanField(default=True, db_index=True)
+    active = models.BooleanField(default=True)
     created_at = models.DateTimeField(blank=True)
     updated_at = models.DateTimeField(blank=True)
 
+    class Meta:
+        indexes = [
+            # Owner-scoped Subscription list.
+            models.Index(fields=['user', 'created_at', 'id'], name='home_sub_user_created_id_idx'),
+        ]
+        constraints = [
+            # Also serves App.get_current_subscription(); inactive history rows stay
+            # out of the index.
+            models.UniqueConstraint(
+                fields=['subscription_app'],
+                condition=models.Q(active=True),
+                name='home_sub_one_active_per_app',
+            ),
+        ]
+
     def __str__(self):
-        return f"Subscription: App: {self.subscription_app.name} {self.plan}"
+        app = related_or_id(self, 'subscription_app')
+        return f"Subscription: App: {getattr(app, 'name', app)} {related_or_id(self, 'plan')}"
 
 
 
@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from home.api.v1.authentication import invalidate_token
+from home.cache import PLAN_CACHE_NAMESPACE, bump_cache_version
+from home.models import Plan
+
+# User fields a cached token authentication depends on.
+TOKEN_AUTH_USER_FIELDS = {'password', 'is_active'}
+
+
+@receiver([post_save, post_delete], sender=Plan)
+def invalidate_plan_cache(sender, **kwargs):
+    bump_cache_version(PLAN_CACHE_NAMESPACE)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, update_fields=None, **kwargs):
+    # A new user has no token yet, and update_last_login() saves only last_login.
+    if created or (update_fields and not TOKEN_AUTH_USER_FIELDS.intersection(update_fields)):
+        return
+    for key in Token.objects.filter(user_id=instance.pk).values_list('key', flat=True):
+        invalidate_token(key)
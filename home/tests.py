@@ -1,9 +1,55 @@
-from datetime import datetime, timezone, timedelta
+import csv
+import importlib
+import json
+import os
+import pickle
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timezone, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-from django.test import TestCase
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from allauth.account.models import EmailAddress
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone as django_timezone
+from django.utils.translation import gettext_lazy
+import pytz
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
 
+from home.api.v1 import renderers as renderers_module, serializers as serializers_module
+from home.api.v1.parsers import FastJSONParser
+from home.api.v1.renderers import FastJSONRenderer, PreEncodedJSON
+from home.api.v1.viewsets import AppViewSet, PlanViewSet, SubscriptionViewSet
+from home.api.v1.authentication import get_token_cache_key, token_cache
+from home.hashing import HashingPool, HashingPoolFull, hashing_pool
+from home.instrumentation import Histogram, endpoint_stats, step_stats
+from home.api.v1.serializers import AppSerializer
+from home.export import EXPORT_FORMATS
+from home.management.commands.benchmark_api import find_regressions, seed
+from home.management.commands.profile_imports import parse_importtime, profile_imports
 from home.models import App, Plan, Subscription
+import modules
+from modules import manifest as modules_manifest
+from modules.utils import OptionsRegistry
+from users.forms import UserChangeForm, UserCreationForm
 from users.models import User
 
 
@@ -23,6 +69,9 @@ class AppTests(TestCase):
             updated_at=datetime.now(),
             )
 
+    def setUp(self):
+        self.client.force_login(self.user)
+
     def test_app_content(self):
         self.assertEqual(self.app.name, 'Hamburger Flipper - test')
         self.assertEqual(self.app.description, 'Web app for determining when to flip burgers. - test')
@@ -103,6 +152,316 @@ class AppTests(TestCase):
         except AssertionError:
             pass
 
+    def test_app_list_requires_authentication(self):
+        self.client.logout()
+        response = self.client.get('/api/v1/apps/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_app_list_scoped_to_request_user(self):
+        other_user = User.objects.create(username='other', name='other')
+        App.objects.create(
+            name='Not Mine',
+            app_type='Web',
+            framework='Django',
+            domain_name='notmine.com',
+            user=other_user,
+            created_at=datetime.now(),
+            updated_at=datetime.now(),
+            )
+        response = self.client.get('/api/v1/apps/')
+        self.assertContains(response, 'Hamburger Flipper')
+        self.assertNotContains(response, 'Not Mine')
+
+    def test_app_list_cursor_pagination(self):
+        response = self.client.get('/api/v1/apps/', {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        self.assertEqual(
+            [app['name'] for app in page['results']],
+            ['Hamburger Flipper', 'Drone Light Show'],
+            )
+        self.assertIsNone(page['previous'])
+
+        response = self.client.get(page['next'])
+        page = response.json()
+        self.assertEqual(
+            [app['name'] for app in page['results']],
+            ['Military Analytics', 'Hamburger Flipper - test'],
+            )
+        self.assertIsNone(page['next'])
+
+    def test_app_list_page_size_is_bounded(self):
+        response = self.client.get('/api/v1/apps/', {'page_size': 100000})
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(response.json()['results']), 200)
+
+
+class AppDetailQueryCountTests(TestCase):
+    """
+    Detail actions resolve and authorize the App with one owner-filtered query.
+    The client is force-authenticated so session lookups don't enter the counts.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.get(name='testuser')
+        cls.app = App.objects.get(name='Hamburger Flipper')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/v1/apps/{self.app.id}/'
+
+    def test_retrieve_query_count(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_update_query_count(self):
+        data = {
+            "name": "Hamburger Flipper",
+            "app_type": "Web",
+            "framework": "Django",
+            "domain_name": "burgerflip.io",
+            "user": self.user.id,
+            "created_at": "2022-12-05T06:08:02.325Z",
+            "updated_at": "2022-12-05T06:08:02.325Z"
+        }
+        # lookup, user pk, name + domain_name uniqueness in one query,
+        # SAVEPOINT, UPDATE, RELEASE
+        with self.assertNumQueries(6):
+            response = self.client.put(self.url, data, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_partial_update_query_count(self):
+        # lookup, UPDATE
+        with self.assertNumQueries(2):
+            response = self.client.patch(self.url, {"description": "patched"}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_destroy_query_count(self):
+        app = App.objects.create(
+            name='Disposable',
+            app_type='Web',
+            framework='Django',
+            domain_name='disposable.com',
+            user=self.user,
+            created_at=datetime.now(),
+            updated_at=datetime.now(),
+            )
+        # lookup, cascade collection of subscriptions, DELETE
+        with self.assertNumQueries(3):
+            response = self.client.delete(f'/api/v1/apps/{app.id}/')
+        self.assertEqual(response.status_code, 204)
+
+    def test_other_users_app_is_not_found(self):
+        other_user = User.objects.create(username='other', name='other')
+        self.client.force_authenticate(other_user)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.delete(self.url).status_code, 404)
+        self.assertTrue(App.objects.filter(id=self.app.id).exists())
+
+
+class AppUniquenessTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.get(name='testuser')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def app_payload(self, **kwargs):
+        data = {
+            "name": "unique app",
+            "app_type": "Web",
+            "framework": "Django",
+            "domain_name": "unique.com",
+            "user": self.user.id,
+            "created_at": "2022-12-05T06:08:02.325Z",
+            "updated_at": "2022-12-05T06:08:02.325Z"
+        }
+        data.update(kwargs)
+        return data
+
+    def test_empty_domain_names_do_not_collide(self):
+        for name in ['no domain 1', 'no domain 2']:
+            response = self.client.post('/api/v1/apps/', self.app_payload(name=name, domain_name=''), format='json')
+            self.assertEqual(response.status_code, 201, response.content)
+            self.assertIsNone(response.json()['domain_name'])
+        self.assertEqual(App.objects.filter(domain_name__isnull=True).count(), 2)
+
+    def test_duplicate_fields_reported_together(self):
+        payload = self.app_payload(name='Hamburger Flipper', domain_name='dronelights.com')
+        response = self.client.post('/api/v1/apps/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(response.json()), ['domain_name', 'name'])
+
+    def test_unique_fields_checked_in_one_query(self):
+        serializer = AppSerializer(data=self.app_payload())
+        # user pk, name + domain_name uniqueness
+        with self.assertNumQueries(2):
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+
+    def test_integrity_error_is_a_validation_error(self):
+        # Simulate a concurrent insert slipping in between validation and the write.
+        check = serializers_module.get_unique_errors
+        calls = []
+
+        def racy_check(*args):
+            calls.append(args)
+            return [{}] if len(calls) == 1 else check(*args)
+
+        with mock.patch.object(serializers_module, 'get_unique_errors', racy_check):
+            response = self.client.post('/api/v1/apps/', self.app_payload(name='Hamburger Flipper'), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()), ['name'])
+        self.assertEqual(App.objects.filter(name='Hamburger Flipper').count(), 1)
+
+    def test_created_at_is_required(self):
+        payload = self.app_payload()
+        del payload['created_at']
+        for url, data in [('/api/v1/apps/', payload), ('/api/v1/apps/bulk/', [payload])]:
+            with self.subTest(url=url):
+                response = self.client.post(url, data, format='json')
+                self.assertEqual(response.status_code, 400)
+                errors = response.json()
+                self.assertIn('created_at', errors[0] if isinstance(errors, list) else errors)
+
+    def test_other_integrity_errors_are_not_conflicts(self):
+        for many, data in [(False, self.app_payload()), (True, [self.app_payload()])]:
+            with self.subTest(many=many):
+                serializer = AppSerializer(data=data, many=many)
+                self.assertTrue(serializer.is_valid(), serializer.errors)
+                with self.assertRaises(IntegrityError):
+                    serializer.save(created_at=None)
+
+
+class BulkWriteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.get(name='testuser')
+        cls.free_plan = Plan.objects.get(name='Free')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def app_payload(self, count, prefix='bulk'):
+        return [
+            {
+                "name": f"{prefix} app {i}",
+                "app_type": "Web",
+                "framework": "Django",
+                "domain_name": f"{prefix}{i}.com",
+                "user": self.user.id,
+                "created_at": "2022-12-05T06:08:02.325Z",
+                "updated_at": "2022-12-05T06:08:02.325Z"
+            }
+            for i in range(count)
+        ]
+
+    def bulk_query_count(self, method, url, data):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertIn(response.status_code, [200, 201], response.content)
+        return len(queries)
+
+    def test_bulk_create_apps(self):
+        response = self.client.post('/api/v1/apps/bulk/', self.app_payload(3), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()), 3)
+        self.assertEqual(App.objects.filter(name__startswith='bulk app').count(), 3)
+
+    def test_bulk_create_query_count_is_constant(self):
+        small = self.bulk_query_count('post', '/api/v1/apps/bulk/', self.app_payload(2, 'small'))
+        large = self.bulk_query_count('post', '/api/v1/apps/bulk/', self.app_payload(50, 'large'))
+        self.assertEqual(small, large)
+
+    def test_bulk_create_reports_per_item_errors(self):
+        payload = self.app_payload(4)
+        payload[1]['name'] = 'Hamburger Flipper'
+        payload[3]['domain_name'] = payload[2]['domain_name']
+        payload[2]['app_type'] = 'Desktop'
+        response = self.client.post('/api/v1/apps/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(errors[0], {})
+        self.assertEqual(list(errors[1]), ['name'])
+        self.assertEqual(list(errors[2]), ['app_type'])
+        self.assertEqual(list(errors[3]), ['domain_name'])
+        self.assertFalse(App.objects.filter(name__startswith='bulk app').exists())
+
+    def test_bulk_create_allows_several_empty_domains(self):
+        payload = self.app_payload(3)
+        for item in payload:
+            item['domain_name'] = ''
+        response = self.client.post('/api/v1/apps/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(App.objects.filter(name__startswith='bulk app', domain_name__isnull=True).count(), 3)
+
+    def test_bulk_create_rejects_unknown_user(self):
+        payload = self.app_payload(2)
+        payload[1]['user'] = 999
+        response = self.client.post('/api/v1/apps/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()[1]), ['user'])
+
+    def test_bulk_update_apps(self):
+        apps = list(App.objects.filter(user=self.user).order_by('id')[:2])
+        payload = [{"id": app.id, "description": f"bulk patched {app.id}"} for app in apps]
+        response = self.client.patch('/api/v1/apps/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        for app in apps:
+            app.refresh_from_db()
+            self.assertEqual(app.description, f"bulk patched {app.id}")
+
+    def test_bulk_update_keeps_own_unique_values(self):
+        app = App.objects.get(name='Drone Light Show')
+        payload = [{"id": app.id, "name": app.name, "domain_name": app.domain_name}]
+        response = self.client.patch('/api/v1/apps/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_bulk_update_query_count_is_constant(self):
+        self.client.post('/api/v1/apps/bulk/', self.app_payload(30), format='json')
+        apps = list(App.objects.filter(name__startswith='bulk app').order_by('id'))
+        small = self.bulk_query_count(
+            'patch', '/api/v1/apps/bulk/', [{"id": app.id, "description": "small"} for app in apps[:2]])
+        large = self.bulk_query_count(
+            'patch', '/api/v1/apps/bulk/', [{"id": app.id, "description": "large"} for app in apps])
+        self.assertEqual(small, large)
+
+    def test_bulk_update_rejects_other_users_apps(self):
+        other_user = User.objects.create(username='other', name='other')
+        self.client.force_authenticate(other_user)
+        app = App.objects.get(name='Drone Light Show')
+        response = self.client.patch(
+            '/api/v1/apps/bulk/', [{"id": app.id, "description": "hijacked"}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()[0]), ['id'])
+        app.refresh_from_db()
+        self.assertNotEqual(app.description, 'hijacked')
+
+    def test_bulk_create_subscriptions(self):
+        apps = App.objects.filter(user=self.user)
+        payload = [
+            {
+                "user": self.user.id,
+                "plan": self.free_plan.id,
+                "subscription_app": app.id,
+                # The apps already have their one active subscription.
+                "active": False,
+                "created_at": "2022-12-05T06:08:02.325Z",
+                "updated_at": "2022-12-05T06:08:02.325Z"
+            }
+            for app in apps
+        ]
+        count = Subscription.objects.count()
+        response = self.client.post('/api/v1/subscriptions/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Subscription.objects.count(), count + len(payload))
+
 
 class PlanTests(TestCase):
     @classmethod
@@ -130,6 +489,61 @@ class PlanTests(TestCase):
         self.assertContains(response, 'Free')
 
 
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PlanCacheTests(TestCase):
+    """Locmem stands in for the Redis tier used in deployment."""
+    def setUp(self):
+        cache.clear()
+
+    def test_plan_list_is_served_from_cache(self):
+        response = self.client.get('/api/v1/plans/')
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            cached_response = self.client.get('/api/v1/plans/')
+        self.assertEqual(cached_response.json(), response.json())
+        self.assertEqual(cached_response['ETag'], response['ETag'])
+
+    def test_plan_detail_is_served_from_cache(self):
+        response = self.client.get('/api/v1/plans/1/')
+        with self.assertNumQueries(0):
+            cached_response = self.client.get('/api/v1/plans/1/')
+        self.assertContains(cached_response, 'Free')
+
+    def test_missing_plan_is_not_cached(self):
+        self.assertEqual(self.client.get('/api/v1/plans/999/').status_code, 404)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/v1/plans/999/').status_code, 404)
+
+    def test_if_none_match_returns_not_modified(self):
+        etag = self.client.get('/api/v1/plans/')['ETag']
+        response = self.client.get('/api/v1/plans/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_plan_save_invalidates_cache(self):
+        etag = self.client.get('/api/v1/plans/')['ETag']
+        plan = Plan.objects.get(name='Pro')
+        plan.description = 'Pro Plan with $30 cost.'
+        plan.save()
+        response = self.client.get('/api/v1/plans/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertContains(response, 'Pro Plan with $30 cost.')
+
+    def test_plan_delete_invalidates_cache(self):
+        Plan.objects.create(
+            name='Enterprise',
+            description='Enterprise Plan.',
+            price=100.0,
+            created_at=datetime.now(),
+            updated_at=datetime.now(),
+            )
+        self.assertContains(self.client.get('/api/v1/plans/'), 'Enterprise')
+        Plan.objects.filter(name='Enterprise').delete()
+        self.assertNotContains(self.client.get('/api/v1/plans/'), 'Enterprise')
+
+
 class SubscriptionTests(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -137,6 +551,9 @@ class SubscriptionTests(TestCase):
         cls.burger_app = App.objects.get(name='Hamburger Flipper')
         cls.subscription = cls.burger_app.app_subscription
 
+    def setUp(self):
+        self.client.force_login(self.user)
+
     def test_subscription_content(self):
         self.assertEqual(self.subscription.user, self.user)
         self.assertEqual(self.subscription.plan.name, 'Free')
@@ -205,5 +622,1215 @@ class SubscriptionTests(TestCase):
         response = self.client.patch('/api/v1/subscriptions/1/', data, content_type='application/json')
         self.assertEqual(response.status_code, 200)
 
+    def test_subscription_update_query_count(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = f'/api/v1/subscriptions/{self.subscription.id}/'
+        # lookup, savepoint, UPDATE, App.app_subscription, release
+        with self.assertNumQueries(5):
+            response = client.patch(url, {"active": False}, format='json')
+        self.assertEqual(response.status_code, 200)
+        pro_plan = Plan.objects.get(name='Pro')
+        # lookup, plan pk, UPDATE
+        with self.assertNumQueries(3):
+            response = client.patch(url, {"plan": pro_plan.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_subscription_update_with_unmatched_app_id(self):
+        # Regression: the ownership check used to look up an App by the
+        # subscription's pk and 500 when no such App existed.
+        subscription = Subscription.objects.create(
+            user=self.user,
+            plan=Plan.objects.get(name='Free'),
+            subscription_app=self.burger_app,
+            active=False,
+            created_at=datetime.now(),
+            updated_at=datetime.now(),
+            )
+        self.assertFalse(App.objects.filter(id=subscription.id).exists())
+        response = self.client.patch(
+            f'/api/v1/subscriptions/{subscription.id}/', {"active": False}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_other_users_subscription_is_not_found(self):
+        other_user = User.objects.create(username='other', name='other')
+        self.client.force_login(other_user)
+        response = self.client.patch(
+            f'/api/v1/subscriptions/{self.subscription.id}/', {"active": False}, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+
+class ExpandableFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.get(name='testuser')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_expanded_subscriptions_cost_no_extra_queries(self):
+        with CaptureQueriesContext(connection) as plain:
+            self.get('/api/v1/subscriptions/')
+        # Less the ETag fingerprint, which expanded lists go without.
+        with self.assertNumQueries(len(plain) - 1):
+            subscriptions = self.get('/api/v1/subscriptions/?expand=plan,subscription_app,user')
+        subscription = Subscription.objects.get(pk=subscriptions[0]['id'])
+        self.assertEqual(subscriptions[0]['plan']['name'], subscription.plan.name)
+        self.assertEqual(subscriptions[0]['subscription_app']['name'], subscription.subscription_app.name)
+        self.assertEqual(subscriptions[0]['user'], {'id': self.user.id, 'email': self.user.email, 'name': self.user.name})
+
+    def test_expanded_apps_cost_no_extra_queries(self):
+        with CaptureQueriesContext(connection) as plain:
+            self.get('/api/v1/apps/')
+        # Less the ETag fingerprint, which expanded lists go without.
+        with self.assertNumQueries(len(plain) - 1):
+            apps = self.get('/api/v1/apps/?expand=user,app_subscription')['results']
+        app = App.objects.get(name='Hamburger Flipper')
+        expanded = next(item for item in apps if item['id'] == app.id)
+        self.assertEqual(expanded['app_subscription']['id'], app.app_subscription_id)
+        self.assertEqual(expanded['user']['id'], self.user.id)
+
+    def test_sparse_fields(self):
+        subscription = self.get('/api/v1/subscriptions/1/?fields=id,plan&expand=plan,user')
+        self.assertEqual(set(subscription), {'id', 'plan'})
+        self.assertEqual(subscription['plan']['name'], 'Free')
+        self.assertEqual(
+            [set(plan) for plan in self.get('/api/v1/plans/?fields=id,name')],
+            [{'id', 'name'}] * Plan.objects.count(),
+        )
+
+    def test_unknown_names_are_rejected(self):
+        response = self.client.get('/api/v1/subscriptions/?fields=id,secret&expand=plan,owner')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'fields': ['Unknown fields: secret.'], 'expand': ['Cannot expand: owner.']})
+        self.assertEqual(self.client.get('/api/v1/plans/?expand=plan').status_code, 400)
+
+    def test_writes_ignore_expand(self):
+        response = self.client.patch('/api/v1/subscriptions/1/?expand=plan&fields=id', {'active': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.json()['plan'], int)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.get(name='testuser')
+        other_user = User.objects.create(username='other', name='other')
+        App.objects.create(
+            name='other app', app_type='Web', framework='Django', user=other_user,
+            created_at=datetime.now(timezone.utc), updated_at=datetime.now(timezone.utc),
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        with CaptureQueriesContext(connection) as queries:
+            content = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(queries), 1)
+        return response, content
+
+    def test_ndjson(self):
+        response, content = self.export('/api/v1/subscriptions/export/')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in content.splitlines()]
+        subscriptions = Subscription.objects.filter(user=self.user).select_related('plan').order_by('pk')
+        self.assertEqual([row['id'] for row in rows], [subscription.id for subscription in subscriptions])
+        self.assertEqual(rows[0]['plan_name'], subscriptions[0].plan.name)
+
+    def test_values_match_the_api(self):
+        penny = Plan.objects.create(
+            name='Penny', description='Small price', price=Decimal('0.00000001'),
+            created_at=datetime.now(timezone.utc), updated_at=datetime.now(timezone.utc),
+        )
+        created_at = datetime(2026, 10, 18, 13, 6, 50, 36609, tzinfo=timezone.utc)
+        app = App.objects.get(name='Hamburger Flipper')
+        for plan, price in [(penny, '0.00000001'), (Plan.objects.get(name='Free'), '0.00000000')]:
+            subscription = Subscription.objects.create(
+                user=self.user, plan=plan, subscription_app=app, active=False,
+                created_at=created_at, updated_at=created_at,
+            )
+            expected = {'created_at': '2026-10-18T13:06:50.036609Z', 'plan_price': price}
+            api = self.client.get(f'/api/v1/subscriptions/{subscription.id}/?expand=plan').json()
+            self.assertEqual({'created_at': api['created_at'], 'plan_price': api['plan']['price']}, expected)
+            for export_format in EXPORT_FORMATS:
+                with self.subTest(plan=plan.name, export_format=export_format):
+                    _, content = self.export(f'/api/v1/subscriptions/export/?export_format={export_format}')
+                    if export_format == 'csv':
+                        rows = csv.DictReader(content.splitlines())
+                    elif export_format == 'json':
+                        rows = json.loads(content)
+                    else:
+                        rows = [json.loads(line) for line in content.splitlines()]
+                    row = next(row for row in rows if int(row['id']) == subscription.id)
+                    self.assertEqual({column: row[column] for column in expected}, expected)
+
+    def test_csv_and_json(self):
+        response, content = self.export('/api/v1/apps/export/?export_format=csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="apps.csv"')
+        lines = content.splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'name', 'app_type'])
+        names = set(App.objects.filter(user=self.user).values_list('name', flat=True))
+        self.assertEqual({line.split(',')[1] for line in lines[1:]}, names)
+
+        response, content = self.export('/api/v1/apps/export/?export_format=json')
+        self.assertEqual({row['name'] for row in json.loads(content)}, names)
+
+    def test_csv_cells_are_not_formulas(self):
+        App.objects.filter(name='Hamburger Flipper').update(name='@SUM(1+1)')
+        response, content = self.export('/api/v1/apps/export/?export_format=csv')
+        rows = list(csv.DictReader(content.splitlines()))
+        self.assertIn("'@SUM(1+1)", [row['name'] for row in rows])
+        self.assertTrue(all(row['name'][0] not in '=+-@' for row in rows))
+
+    def test_streaming_is_instrumented(self):
+        before = step_stats().get('export.subscriptions.ndjson', {'count': 0, 'queries': 0})
+        self.export('/api/v1/subscriptions/export/')
+        after = step_stats()['export.subscriptions.ndjson']
+        self.assertEqual((after['count'] - before['count'], after['queries'] - before['queries']), (1, 1))
+
+    def test_unknown_format(self):
+        response = self.client.get('/api/v1/subscriptions/export/?export_format=xml')
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'subscriptions.csv')
+            stderr = StringIO()
+            call_command('export_data', 'subscriptions', '--export-format=csv', f'--output={path}', stderr=stderr)
+            with open(path) as f:
+                self.assertEqual(len(f.read().splitlines()), Subscription.objects.count() + 1)
+        self.assertIn(f'Exported {Subscription.objects.count()} subscriptions', stderr.getvalue())
+
+        stdout = StringIO()
+        call_command('export_data', 'apps', f'--user={self.user.id}', stdout=stdout, stderr=StringIO())
+        self.assertEqual(len(stdout.getvalue().splitlines()), App.objects.filter(user=self.user).count())
+
+
+class FastListTests(TestCase):
+    """The fast list path renders byte-for-byte what the serializers render."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.get(name='testuser')
+        plan = Plan.objects.create(
+            name='Odd', description='', price=Decimal('12.3456789'),
+            created_at=datetime(2023, 3, 26, 1, 30, 0, 123456, tzinfo=timezone.utc),
+            updated_at=datetime(2023, 3, 26, 1, 30, tzinfo=timezone.utc),
+        )
+        for i in range(60):
+            app = App.objects.create(
+                name=f'fast {i}', app_type='Mobile', framework='React Native', user=cls.user,
+                domain_name=None if i % 2 else f'fast{i}.example.com',
+                created_at=datetime(2023, 1, 1, tzinfo=timezone.utc) + timedelta(hours=i, microseconds=i),
+                updated_at=datetime(2023, 6, 1, tzinfo=timezone(timedelta(hours=5))),
+            )
+            Subscription.objects.create(
+                user=cls.user, plan=plan, subscription_app=app, active=i % 3 == 0,
+                created_at=app.created_at, updated_at=app.updated_at,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertSameAsSerializer(self, viewset, url):
+        cache.clear()
+        fast = self.client.get(url)
+        self.assertEqual(fast.status_code, 200)
+        cache.clear()
+        with mock.patch.object(viewset, 'fast_list', False):
+            regular = self.client.get(url)
+        self.assertEqual(fast.content, regular.content)
+        return fast
+
+    def test_parity(self):
+        for viewset, url in [
+            (AppViewSet, '/api/v1/apps/'),
+            (AppViewSet, '/api/v1/apps/?page_size=7&fields=id,domain_name,created_at'),
+            (PlanViewSet, '/api/v1/plans/'),
+            (SubscriptionViewSet, '/api/v1/subscriptions/'),
+            (SubscriptionViewSet, '/api/v1/subscriptions/?fields=plan,active'),
+        ]:
+            with self.subTest(url=url):
+                self.assertSameAsSerializer(viewset, url)
+                with django_timezone.override('America/New_York'):
+                    self.assertSameAsSerializer(viewset, url)
+
+    def test_cursor_pages_match(self):
+        response = self.assertSameAsSerializer(AppViewSet, '/api/v1/apps/?page_size=20')
+        self.assertSameAsSerializer(AppViewSet, response.json()['next'])
+
+    def test_fields_without_the_ordering_columns_paginate(self):
+        response = self.assertSameAsSerializer(AppViewSet, '/api/v1/apps/?fields=id,name&page_size=1')
+        self.assertEqual(list(response.json()['results'][0]), ['id', 'name'])
+        response = self.assertSameAsSerializer(AppViewSet, response.json()['next'])
+        self.assertEqual(len(response.json()['results']), 1)
+
+    def test_fast_read_serializers_are_shared_across_field_orders(self):
+        first = serializers_module.get_fast_read_serializer(AppSerializer, ['name', 'id'])
+        self.assertIs(serializers_module.get_fast_read_serializer(AppSerializer, ['id', 'name', 'id']), first)
+        self.assertEqual(first.names, ['id', 'name'])
+        cache_info = serializers_module._build_fast_read_serializer.cache_info()
+        self.assertIsNotNone(cache_info.maxsize)
+
+    def test_fast_list_queries(self):
+        # ETag fingerprint, rows
+        with self.assertNumQueries(2):
+            self.client.get('/api/v1/subscriptions/')
+
+
+class JSONRendererParityTests(TestCase):
+    payload = {
+        'utc': datetime(2023, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc),
+        'pytz': django_timezone.make_aware(datetime(2023, 1, 2, 3, 4, 5), pytz.timezone('Europe/London')),
+        'offset': datetime(2023, 1, 2, 3, 4, 5, tzinfo=timezone(timedelta(hours=-5, minutes=-30))),
+        'naive': datetime(2023, 1, 2, 3, 4, 5, 6),
+        'date': date(2023, 1, 2),
+        'time': datetime(2023, 1, 2, 3, 4, 5, 6).time(),
+        'decimal': Decimal('12.34567800'),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'lazy': gettext_lazy('This field is required.'),
+        'text': 'caf\u00e9 \u2028 \u2029 "quoted" \\ \U0001f600',
+        'numbers': [0, -1, 2 ** 63 - 1, 1.5, 0.1, True, False, None],
+        'floats': [0.0001, -0.0, 123456.789, 1e15, 9999999999999998.0, -2.5e-4],
+        'nested': OrderedDict([('b', (1, 2)), ('a', {'c': []})]),
+    }
+
+    def assertSameBytes(self, data, accepted_media_type=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, accepted_media_type),
+            JSONRenderer().render(data, accepted_media_type),
+        )
+
+    def test_parity(self):
+        for data in [self.payload, [self.payload], {1: 'int key'}, {'big': 2 ** 70}, [], {}, '']:
+            with self.subTest(data=data):
+                self.assertSameBytes(data)
+                self.assertSameBytes(data, 'application/json; indent=4')
+                with mock.patch.object(renderers_module, 'orjson', None):
+                    self.assertSameBytes(data)
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_floats_outside_repr_range_keep_their_value(self):
+        # Documented difference: orjson writes 1e16 and 1e-05 as 1e16 and 0.00001.
+        for value in [1e16, 1e22, 1.5e-7, 0.00001, 5e-324, 1.7976931348623157e308]:
+            with self.subTest(value=value):
+                self.assertEqual(json.loads(FastJSONRenderer().render([value])), [value])
+        if renderers_module.orjson is not None:
+            self.assertEqual(FastJSONRenderer().render([float('nan')]), b'[null]')
+
+    def test_api_payloads(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(name='testuser'))
+        for url in ['/api/v1/apps/', '/api/v1/apps/1/?expand=user', '/api/v1/plans/', '/api/v1/subscriptions/?expand=plan']:
+            with self.subTest(url=url):
+                cache.clear()
+                response = client.get(url)
+                self.assertEqual(response.content, JSONRenderer().render(response.json()))
+
+    def test_pre_encoded(self):
+        body = JSONRenderer().render(self.payload)
+        self.assertEqual(FastJSONRenderer().render(PreEncodedJSON(body)), body)
+        self.assertEqual(
+            FastJSONRenderer().render(PreEncodedJSON(body), 'application/json; indent=2'),
+            JSONRenderer().render(json.loads(body), 'application/json; indent=2'),
+        )
+
+    def test_parser(self):
+        body = JSONRenderer().render(self.payload)
+        self.assertEqual(FastJSONParser().parse(BytesIO(body)), JSONParser().parse(BytesIO(body)))
+        self.assertEqual(FastJSONParser().parse(BytesIO(b'{"big": 1180591620717411303424}')), {'big': 2 ** 70})
+        for invalid in [b'{"a": NaN}', b'{"a": 1', b'[Infinity]']:
+            with self.subTest(body=invalid), self.assertRaisesMessage(ParseError, 'JSON parse error'):
+                FastJSONParser().parse(BytesIO(invalid))
+
+
+class SwitchPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.get(name='testuser')
+        cls.app = App.objects.get(name='Hamburger Flipper')
+        cls.free = Plan.objects.get(name='Free')
+        cls.pro = Plan.objects.get(name='Pro')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_switch_plan(self):
+        previous = self.app.get_current_subscription()
+        response = self.client.post(f'/api/v1/apps/{self.app.id}/switch-plan/', {'plan': self.pro.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        current = self.app.get_current_subscription()
+        self.assertEqual(response.json()['id'], current.id)
+        self.assertEqual((current.plan, current.user, current.active), (self.pro, self.user, True))
+        previous.refresh_from_db()
+        self.assertFalse(previous.active)
+        self.app.refresh_from_db()
+        self.assertEqual(self.app.app_subscription, current)
+        self.assertEqual(Subscription.objects.filter(subscription_app=self.app, active=True).count(), 1)
+
+    def test_switch_to_current_plan_keeps_subscription(self):
+        current = self.app.get_current_subscription()
+        self.assertEqual(self.app.switch_plan(self.free), current)
+        self.assertEqual(Subscription.objects.filter(subscription_app=self.app).count(), 1)
+
+    def test_current_subscription_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.app.get_current_subscription().plan, self.free)
+
+    def test_other_users_app_is_not_found(self):
+        self.client.force_authenticate(User.objects.create(username='other', name='other'))
+        response = self.client.post(f'/api/v1/apps/{self.app.id}/switch-plan/', {'plan': self.pro.id}, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.app.get_current_subscription().plan, self.free)
+
+    def test_second_active_subscription_is_rejected(self):
+        data = {
+            'user': self.user.id, 'plan': self.pro.id, 'subscription_app': self.app.id,
+            'created_at': '2022-12-05T06:08:02Z', 'updated_at': '2022-12-05T06:08:02Z',
+        }
+        response = self.client.post('/api/v1/subscriptions/', data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'subscription_app': [serializers_module.ACTIVE_SUBSCRIPTION_MESSAGE]})
+
+        response = self.client.post('/api/v1/subscriptions/', dict(data, active=False), format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.patch(f"/api/v1/subscriptions/{response.json()['id']}/", {'active': True}, format='json')
+        self.assertEqual(response.status_code, 400)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Subscription.objects.create(**dict(data, user=self.user, plan=self.pro, subscription_app=self.app))
+
+    def test_bulk_second_active_subscription_is_rejected(self):
+        data = {
+            'user': self.user.id, 'plan': self.pro.id, 'subscription_app': self.app.id,
+            'created_at': '2022-12-05T06:08:02Z', 'updated_at': '2022-12-05T06:08:02Z',
+        }
+        response = self.client.post('/api/v1/subscriptions/bulk/', [data], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'subscription_app': [serializers_module.ACTIVE_SUBSCRIPTION_MESSAGE]})
+
+    def assert_app_subscription(self, subscription_id):
+        self.app.refresh_from_db()
+        self.assertEqual(self.app.app_subscription_id, subscription_id)
+
+    def test_subscription_writes_keep_app_subscription_in_step(self):
+        current = self.app.get_current_subscription()
+        url = '/api/v1/subscriptions/'
+        self.assertEqual(self.client.patch(f'{url}{current.id}/', {'active': False}, format='json').status_code, 200)
+        self.assert_app_subscription(None)
+
+        data = {
+            'user': self.user.id, 'plan': self.pro.id, 'subscription_app': self.app.id,
+            'created_at': '2022-12-05T06:08:02Z', 'updated_at': '2022-12-05T06:08:02Z',
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, 201)
+        created = response.json()['id']
+        self.assert_app_subscription(created)
+
+        response = self.client.patch(f'{url}bulk/', [{'id': created, 'active': False}], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assert_app_subscription(None)
+
+        response = self.client.post(f'{url}bulk/', [data], format='json')
+        self.assertEqual(response.status_code, 201)
+        # SQLite's bulk_create() leaves the ids unset.
+        self.assert_app_subscription(self.app.get_current_subscription().id)
+
+    def test_moving_active_subscriptions_between_apps(self):
+        other = App.objects.filter(user=self.user).exclude(pk=self.app.pk).first()
+        mine, theirs = self.app.get_current_subscription(), other.get_current_subscription()
+        self.client.patch(f'/api/v1/subscriptions/{theirs.id}/', {'active': False}, format='json')
+        response = self.client.patch(
+            '/api/v1/subscriptions/bulk/', [{'id': mine.id, 'subscription_app': other.id}], format='json',
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assert_app_subscription(None)
+        other.refresh_from_db()
+        self.assertEqual(other.app_subscription_id, mine.id)
+
+
+class ConditionalRequestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.get(name='testuser')
+        cls.app = App.objects.get(name='Hamburger Flipper')
+        cls.subscription = Subscription.objects.filter(user=cls.user).first()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/v1/apps/{self.app.id}/'
+
+    def test_detail_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertIn('Last-Modified', response)
+        # updated_at only, nothing serialized
+        with self.assertNumQueries(1):
+            cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], response['ETag'])
+        self.assertEqual(cached.content, b'')
+        cached = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_detail_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.patch(self.url, {'description': 'patched'}, format='json')
+        self.assertNotEqual(response['ETag'], etag)
+        # updated_at, then the object
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['description'], 'patched')
+
+    def test_plain_detail_costs_no_extra_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/v1/subscriptions/{self.subscription.id}/')
+        self.assertIn('ETag', response)
+
+    def test_missing_object_is_not_found(self):
+        for pk in [0, 'nope']:
+            response = self.client.get(f'/api/v1/apps/{pk}/', HTTP_IF_NONE_MATCH='"1.1"')
+            self.assertEqual(response.status_code, 404)
+
+    def test_expanded_detail_has_no_validators(self):
+        response = self.client.get(self.url + '?expand=user')
+        self.assertNotIn('ETag', response)
+
+    def test_list_not_modified(self):
+        for url in ['/api/v1/apps/', '/api/v1/subscriptions/?fields=id,active']:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                # fingerprint only
+                with self.assertNumQueries(1):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_list_etag_follows_the_query(self):
+        etag = self.client.get('/api/v1/apps/?fields=id,name')['ETag']
+        for url, status_code in [
+            ('/api/v1/apps/?fields=name,id,id', 304),
+            ('/api/v1/apps/?fields=id', 200),
+            ('/api/v1/apps/?fields=id,name&page_size=1', 200),
+            ('/api/v1/apps/?fields=id,name&page_size=1000', 200),
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status_code)
+        first = self.client.get('/api/v1/apps/?page_size=1')
+        self.assertEqual(
+            self.client.get('/api/v1/apps/?page_size=1', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304,
+        )
+        self.assertEqual(self.client.get(first.json()['next'], HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+        # Clamped to the same max_page_size.
+        etag = self.client.get('/api/v1/apps/?page_size=500')['ETag']
+        self.assertEqual(self.client.get('/api/v1/apps/?page_size=1000', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_list_fingerprint_follows_writes(self):
+        etags = [self.client.get('/api/v1/apps/')['ETag']]
+        self.client.patch(self.url, {'description': 'patched'}, format='json')
+        etags.append(self.client.get('/api/v1/apps/')['ETag'])
+        App.objects.create(
+            name='New app', app_type='Web', framework='Django', user=self.user,
+            created_at=self.app.created_at, updated_at=self.app.updated_at,
+        )
+        etags.append(self.client.get('/api/v1/apps/')['ETag'])
+        self.client.patch('/api/v1/apps/bulk/', [{'id': self.app.id, 'description': 'bulk'}], format='json')
+        etags.append(self.client.get('/api/v1/apps/')['ETag'])
+        self.assertEqual(len(set(etags)), len(etags))
+
+    def test_delete_then_create_changes_the_list(self):
+        def create(name):
+            return App.objects.create(
+                name=name, app_type='Web', framework='Django', user=self.user,
+                created_at=self.app.created_at, updated_at=self.app.updated_at - timedelta(days=365),
+            )
+
+        create('Replaced app')
+        etag = self.client.get('/api/v1/apps/')['ETag']
+        App.objects.filter(name='Replaced app').delete()
+        create('Replacement app')
+        # Same count and max(updated_at); the new row's pk gives it away.
+        self.assertEqual(self.client.get('/api/v1/apps/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_creates_are_stamped(self):
+        old = '2020-01-01T00:00:00Z'
+        data = {
+            'name': 'Stamped', 'app_type': 'Web', 'framework': 'Django', 'user': self.user.id,
+            'created_at': old, 'updated_at': old,
+        }
+        for response in [
+            self.client.post('/api/v1/apps/', data, format='json'),
+            self.client.post('/api/v1/apps/bulk/', [dict(data, name='Stamped in bulk')], format='json'),
+        ]:
+            self.assertEqual(response.status_code, 201, response.content)
+        for app in App.objects.filter(name__startswith='Stamped'):
+            self.assertEqual(app.created_at.year, 2020)
+            self.assertGreater(app.updated_at, self.app.updated_at)
+
+    def test_if_match(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.patch(self.url, {'description': 'first'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.patch(self.url, {'description': 'second'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response.json()['detail'], 'The object was modified since you last read it.')
+        self.app.refresh_from_db()
+        self.assertEqual(self.app.description, 'first')
+
+    def test_if_match_on_subscription(self):
+        url = f'/api/v1/subscriptions/{self.subscription.id}/'
+        etag = self.client.get(url)['ETag']
+        response = self.client.patch(url, {'active': False}, format='json', HTTP_IF_MATCH='"0.0"')
+        self.assertEqual(response.status_code, 412)
+        response = self.client.patch(url, {'active': False}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class AdminChangelistQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.user = User.objects.get(name='testuser')
+        cls.plan = Plan.objects.get(name='Free')
+
+    def setUp(self):
+        self.client.force_login(self.admin_user)
+
+    def add_apps(self, count):
+        for i in range(count):
+            app = App.objects.create(
+                name=f'Admin App {App.objects.count()}',
+                app_type='Web',
+                framework='Django',
+                domain_name=f'admin{App.objects.count()}.com',
+                user=self.user,
+                created_at=datetime.now(),
+                updated_at=datetime.now(),
+                )
+            app.app_subscription = Subscription.objects.create(
+                user=self.user,
+                plan=self.plan,
+                subscription_app=app,
+                created_at=datetime.now(),
+                updated_at=datetime.now(),
+                )
+            app.save()
+
+    def changelist_query_count(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_query_count_is_constant(self):
+        for url in ['/admin/home/app/', '/admin/home/subscription/', '/admin/home/plan/']:
+            with self.subTest(url=url):
+                self.add_apps(2)
+                small = self.changelist_query_count(url)
+                self.add_apps(20)
+                self.assertEqual(self.changelist_query_count(url), small)
+
+    def test_str_does_not_load_relations(self):
+        app = App.objects.get(name='Hamburger Flipper')
+        subscription = Subscription.objects.get(id=app.app_subscription_id)
+        with self.assertNumQueries(0):
+            str(app)
+            str(subscription)
+        subscription = Subscription.objects.select_related('subscription_app', 'plan').get(id=subscription.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(str(subscription), 'Subscription: App: Hamburger Flipper Plan: Free - Free Plan with $0 cost.')
+
+
+class MetricsTests(TestCase):
+    def test_metrics_require_admin(self):
+        self.client.force_login(User.objects.get(name='testuser'))
+        self.assertEqual(self.client.get('/api/v1/metrics/').status_code, 403)
+
+    def test_metrics_report_db_pool(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.get('/api/v1/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('db_pool', response.json())
+        self.assertIn('password_hashing', response.json())
+
+
+class StartupImportTests(SimpleTestCase):
+    def test_parse_importtime(self):
+        output = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |   rest_framework.compat\n'
+            'import time:       300 |        420 | rest_framework\n'
+        )
+        self.assertEqual(parse_importtime(output), [
+            {'module': 'rest_framework.compat', 'self_us': 120, 'cumulative_us': 120, 'depth': 1},
+            {'module': 'rest_framework', 'self_us': 300, 'cumulative_us': 420, 'depth': 0},
+        ])
+
+    def test_check_skips_lazy_imports(self):
+        # The wall-clock import budget is asserted in home.benchmarks.
+        env = dict(os.environ, SKIP_SECRET_MANAGER='1', DEBUG='False')
+        env.pop('DJANGO_EXTENSIONS', None)
+        modules = {module['module'] for module in profile_imports(['check'], env=env)}
+        for lazy in ['drf_yasg.views', 'django_extensions', 'storages', 'google.auth']:
+            self.assertNotIn(lazy, modules)
+
+
+class ModulesManifestTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.modules_dir = os.path.join(tmp.name, 'modules')
+        self.manifest_path = os.path.join(tmp.name, 'manifest.json')
+        for name in ['apps.py', 'urls.py', 'admin.py']:
+            self.touch(name)
+        self.touch('articles', 'apps.py')
+        self.touch('articles', 'urls.py')
+        self.touch('articles', 'migrations', 'apps.py')
+        self.touch('articles', 'node_modules', 'pkg', 'urls.py')
+
+    def touch(self, *parts):
+        path = os.path.join(self.modules_dir, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'w').close()
+
+    def read(self):
+        return modules_manifest.read_manifest(self.modules_dir, self.manifest_path)
+
+    def test_discover_modules(self):
+        self.assertEqual(modules_manifest.discover_modules(self.modules_dir), {
+            'apps': ['modules', 'modules.articles'],
+            'urls': ['modules.articles.urls'],
+            'admins': [],
+        })
+
+    def test_manifest_is_reused_until_a_module_is_added(self):
+        manifest = self.read()
+        self.assertFalse(modules_manifest.manifest_is_stale(self.modules_dir, self.manifest_path))
+        with mock.patch.object(modules_manifest, 'discover_modules') as discover:
+            self.assertEqual(self.read(), manifest)
+        discover.assert_not_called()
+
+        time.sleep(0.01)
+        self.touch('social_auth', 'apps.py')
+        self.touch('social_auth', 'admin.py')
+        manifest = self.read()
+        self.assertEqual(manifest['apps'], ['modules', 'modules.articles', 'modules.social_auth'])
+        self.assertEqual(manifest['admins'], ['modules.social_auth.admin'])
+        self.assertFalse(modules_manifest.manifest_is_stale(self.modules_dir, self.manifest_path))
+
+    def test_committed_manifest_is_current(self):
+        with open(modules_manifest.MANIFEST_PATH) as f:
+            self.assertEqual(json.load(f), modules_manifest.discover_modules())
+
+
+class OptionsRegistryTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.options_path = os.path.join(tmp.name, 'options.json')
+        self.write_options({'test-articles': {'PAGE_SIZE': 50, 'TITLE': ''}})
+        os.makedirs(os.path.join(tmp.name, 'test_articles'))
+        with open(os.path.join(tmp.name, 'test_articles', 'options.py'), 'w') as f:
+            f.write('import os\nPAGE_SIZE = 10\nTITLE = "Articles"\n_PRIVATE = 1\n')
+        patcher = mock.patch.object(modules, '__path__', modules.__path__ + [tmp.name])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(sys.modules.pop, 'modules.test_articles.options', None)
+        self.addCleanup(sys.modules.pop, 'modules.test_articles', None)
+        self.registry = OptionsRegistry(self.options_path, tmp.name, check_interval=0)
+
+    def write_options(self, module_options):
+        with open(self.options_path, 'w') as f:
+            json.dump({'module_options': module_options}, f)
+
+    def test_options_json_overrides_defaults(self):
+        self.assertEqual(self.registry.get_option('test-articles', 'PAGE_SIZE'), 50)
+        self.assertEqual(self.registry.get_option('test-articles', 'TITLE'), 'Articles')
+        self.assertEqual(self.registry.get_all_options('test-articles'), {'PAGE_SIZE': 50, 'TITLE': 'Articles'})
+        with self.assertRaises(AttributeError):
+            self.registry.get_option('test-articles', 'MISSING')
+        with self.assertRaises(LookupError):
+            self.registry.get_option('missing', 'PAGE_SIZE')
+
+    def test_tree_is_walked_once_and_options_json_reloaded_on_change(self):
+        with mock.patch.object(self.registry, '_index_options_modules', wraps=self.registry._index_options_modules) as index:
+            for _ in range(3):
+                self.registry.get_option('test-articles', 'TITLE')
+        self.assertEqual(index.call_count, 1)
+
+        self.write_options({'test-articles': {'PAGE_SIZE': 25}})
+        os.utime(self.options_path, ns=(time.time_ns() + 10 ** 9,) * 2)
+        self.assertEqual(self.registry.get_option('test-articles', 'PAGE_SIZE'), 25)
+
+
+class ProjectReportTests(TestCase):
+    def generate(self, *args):
+        stdout = StringIO()
+        call_command('generate_project_report', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_report_is_built_in_process(self):
+        with mock.patch('subprocess.run') as run:
+            report = json.loads(self.generate())
+        run.assert_not_called()
+        self.assertIn('App', report['models'])
+        self.assertIn(
+            {'url': '/api/v1/apps/<pk>/', 'module': 'home.api.v1.viewsets.AppViewSet', 'name': 'apps-detail', 'decorators': ''},
+            report['urls'],
+        )
+        app_stats = next(stats for stats in report['model_stats'] if stats['model'] == 'home.App')
+        self.assertEqual(app_stats['table'], 'home_app')
+        self.assertEqual(app_stats['rows'], App.objects.count())
+        self.assertIn(
+            {'name': 'home_app_user_created_id_idx', 'columns': ['user_id', 'created_at', 'id'], 'primary_key': False, 'unique': False},
+            app_stats['indexes'],
+        )
+
+    def test_stream_matches_buffered_report(self):
+        self.assertEqual(json.loads(self.generate('--stream')), json.loads(self.generate()))
+
+
+class TokenAuthenticationCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tokenuser', 'tokenuser@example.com', 'password')
+        self.token = Token.objects.create(user=self.user)
+        cache.clear()
+        token_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def token_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/apps/')
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries if 'authtoken_token' in query['sql']]
+
+    def assertRejected(self):
+        self.assertEqual(self.client.get('/api/v1/apps/').status_code, 403)
+
+    def test_token_lookup_is_cached(self):
+        self.assertEqual(len(self.token_queries()), 1)
+        self.assertEqual(self.token_queries(), [])
+        cache.clear()
+        # The process-local tier answers even without the shared cache.
+        self.assertEqual(self.token_queries(), [])
+
+    def test_password_hash_is_not_cached(self):
+        self.token_queries()
+        cached = cache.get(get_token_cache_key(self.token.key))
+        self.assertIn('password', cached[0].get_deferred_fields())
+        self.assertNotIn(self.user.password.encode(), pickle.dumps(cached))
+
+    def test_login_returns_a_usable_token(self):
+        response = APIClient().post('/api/v1/login/', {'username': 'tokenuser', 'password': 'password'})
+        self.assertEqual(response.data['token'], self.token.key)
+        self.assertEqual(len(self.token_queries()), 1)
+
+    def test_deleted_token_is_rejected(self):
+        self.token_queries()
+        self.token.delete()
+        self.assertRejected()
+
+    def test_deactivated_user_is_rejected(self):
+        self.token_queries()
+        self.user.is_active = False
+        self.user.save()
+        self.assertRejected()
+
+    def test_password_change_invalidates_cached_token(self):
+        self.token_queries()
+        self.user.set_password('changed')
+        self.user.save(update_fields=['password'])
+        self.assertIsNone(token_cache.get(get_token_cache_key(self.token.key)))
+        self.assertEqual(len(self.token_queries()), 1)
+
+    def test_last_login_update_keeps_cached_token(self):
+        self.token_queries()
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(self.token_queries(), [])
+
+
+class LoginTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('loginuser', 'LoginUser@example.com', 'password')
+        self.client = APIClient()
+
+    def login(self, username, password='password'):
+        return self.client.post('/api/v1/login/', {'username': username, 'password': password})
+
+    def test_login_by_username_or_email(self):
+        for username in ['loginuser', 'loginuser@example.com']:
+            with self.subTest(username=username):
+                response = self.login(username)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data['user']['id'], self.user.id)
+        self.assertEqual(Token.objects.filter(user=self.user).count(), 1)
+
+    def test_invalid_credentials(self):
+        submitted = hashing_pool.stats()['submitted']
+        for username, password in [('loginuser', 'wrong'), ('nobody', 'password')]:
+            with self.subTest(username=username):
+                response = self.login(username, password)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data['non_field_errors'][0].code, 'authorization')
+        # Unknown users still cost a hash.
+        self.assertEqual(hashing_pool.stats()['submitted'], submitted + 2)
+
+    def test_inactive_user_cannot_log_in(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.login('loginuser').status_code, 400)
+
+    def test_only_verified_or_primary_addresses_log_in(self):
+        address = EmailAddress.objects.create(user=self.user, email='alias@example.com', verified=False, primary=False)
+        self.assertEqual(self.login('alias@example.com').status_code, 400)
+        address.verified = True
+        address.save()
+        self.assertEqual(self.login('alias@example.com').status_code, 200)
+
+    def test_one_hash_per_login(self):
+        # The identifier is one user's username and another one's e-mail.
+        User.objects.create_user('other', 'loginuser@example.org', 'password')
+        User.objects.create_user('loginuser@example.org', 'third@example.com', 'other password')
+        submitted = hashing_pool.stats()['submitted']
+        self.assertEqual(self.login('loginuser@example.org').status_code, 400)
+        self.assertEqual(hashing_pool.stats()['submitted'], submitted + 1)
+
+    @override_settings(ACCOUNT_AUTHENTICATION_METHOD='username', AUTHENTICATION_BACKENDS=[
+        'allauth.account.auth_backends.AuthenticationBackend',
+    ])
+    def test_configured_authentication_method_is_honoured(self):
+        self.assertEqual(self.login('loginuser@example.com').status_code, 400)
+        self.assertEqual(self.login('LoginUser').status_code, 200)
+
+    def test_existing_token_is_read_with_the_user(self):
+        token = Token.objects.create(user=self.user)
+        with self.assertNumQueries(1):
+            response = self.login('loginuser')
+        self.assertEqual(response.data['token'], token.key)
+
+    def test_outdated_password_hash_is_upgraded(self):
+        self.user.password = make_password('password', hasher='pbkdf2_sha1')
+        self.user.save()
+        self.assertEqual(self.login('loginuser').status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+
+    def test_full_hashing_pool_returns_503(self):
+        with mock.patch.object(hashing_pool, 'run', side_effect=HashingPoolFull):
+            response = self.login('loginuser')
+        self.assertEqual(response.status_code, 503)
+
+    def test_load_test_command(self):
+        stdout = StringIO()
+        call_command('loadtest_login', username='loginuser', password='password', requests=3, concurrency=1, stdout=stdout)
+        output = stdout.getvalue()
+        self.assertIn('3 logins', output)
+        self.assertIn('p99', output)
+        self.assertIn('200=3', output)
+
+
+class HashingPoolTests(SimpleTestCase):
+    def test_rejects_when_workers_and_queue_are_busy(self):
+        pool = HashingPool(workers=1, max_queue=0)
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+            return 'done'
+
+        results = []
+        thread = threading.Thread(target=lambda: results.append(pool.run(block)))
+        thread.start()
+        started.wait(5)
+        self.assertEqual(pool.stats()['pending'], 1)
+        with self.assertRaises(HashingPoolFull):
+            pool.run(len, 'abc')
+        release.set()
+        thread.join(5)
+        self.assertEqual(results, ['done'])
+        self.assertEqual(pool.run(len, 'abc'), 3)
+        stats = pool.stats()
+        self.assertEqual((stats['submitted'], stats['completed'], stats['rejected'], stats['pending']), (2, 2, 1, 0))
+
+
+class SignupTests(TestCase):
+    def signup(self, email, name='New Person'):
+        return APIClient().post('/api/v1/signup/', {'name': name, 'email': email, 'password': 'pw12345678'})
+
+    def test_signup_query_count(self):
+        # e-mail check, username candidates, SAVEPOINT, user INSERT, EmailAddress INSERT, RELEASE
+        with self.assertNumQueries(6):
+            response = self.signup(' New.Person@Example.COM ')
+        self.assertEqual(response.status_code, 201)
+        user = User.objects.get(id=response.data['id'])
+        self.assertEqual((user.username, user.email), ('new_person', 'new.person@example.com'))
+        self.assertTrue(user.check_password('pw12345678'))
+        self.assertEqual(
+            list(EmailAddress.objects.filter(user=user).values_list('email', 'primary', 'verified')),
+            [('new.person@example.com', True, False)],
+        )
+
+    def test_signup_steps_are_instrumented(self):
+        before = step_stats()
+        self.signup('steps@example.com')
+        after = step_stats()
+        for step, queries in [('signup.validate_email', 1), ('signup.generate_username', 1), ('signup.save', 4)]:
+            with self.subTest(step=step):
+                self.assertEqual(after[step]['count'] - before.get(step, {}).get('count', 0), 1)
+                self.assertEqual(after[step]['queries'] - before.get(step, {}).get('queries', 0), queries)
+
+    def test_username_candidates_resolved_in_one_query(self):
+        for i in range(3):
+            self.assertEqual(self.signup(f'same{i}@example.com', name='Same Name').status_code, 201)
+        usernames = set(User.objects.filter(email__startswith='same').values_list('username', flat=True))
+        self.assertEqual(len(usernames), 3)
+        self.assertIn('same_name', usernames)
+
+    def test_duplicate_email_is_rejected_case_insensitively(self):
+        self.assertEqual(self.signup('taken@example.com').status_code, 201)
+        with self.assertNumQueries(1):
+            response = self.signup('Taken@Example.com')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.data)
+
+    def test_email_of_another_users_address_is_rejected(self):
+        user = User.objects.create(username='other', email='')
+        EmailAddress.objects.create(user=user, email='secondary@example.com')
+        self.assertEqual(self.signup('SECONDARY@example.com').status_code, 400)
+
+    def test_concurrent_duplicate_hits_the_constraint(self):
+        User.objects.create(username='first', email='race@example.com')
+        with mock.patch.object(serializers_module, 'email_taken', side_effect=[False, True]):
+            response = self.signup('race@example.com')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.data)
+        with self.assertRaises(IntegrityError):
+            User.objects.create(username='second', email='RACE@example.com')
+
+    def test_concurrent_username_is_regenerated(self):
+        User.objects.create(username='racer', email='racer@example.com')
+        generated = mock.patch.object(
+            serializers_module, 'generate_unique_username', side_effect=['racer', 'racer2'],
+        )
+        with generated:
+            response = self.signup('racer@example.org', name='Racer')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(User.objects.get(id=response.data['id']).username, 'racer2')
+
+    def test_repeated_username_conflicts_are_reported(self):
+        User.objects.create(username='racer', email='racer@example.com')
+        with mock.patch.object(serializers_module, 'generate_unique_username', return_value='racer'):
+            response = self.signup('racer@example.org', name='Racer')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('non_field_errors', response.data)
+
+
+class UserAdminFormTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('adminformuser', 'Taken@Example.com', 'password')
+
+    def test_creation_form_rejects_email_in_another_case(self):
+        data = {'username': 'someone', 'email': 'taken@example.COM', 'password1': 'pw12345678!', 'password2': 'pw12345678!'}
+        form = UserCreationForm(data)
+        self.assertFalse(form.is_valid())
+        self.assertIn('email', form.errors)
+        form = UserCreationForm(dict(data, email='free@example.com'))
+        self.assertTrue(form.is_valid(), form.errors)
+
+    def test_change_form_allows_own_email(self):
+        other = User.objects.create_user('otheruser', 'other@example.com', 'password')
+        data = {
+            'username': 'otheruser', 'email': 'OTHER@example.com', 'password': other.password,
+            'date_joined': '2022-12-05 06:08:02', 'is_active': True,
+        }
+        self.assertTrue(UserChangeForm(data, instance=other).is_valid())
+        form = UserChangeForm(dict(data, email='TAKEN@example.com'), instance=other)
+        self.assertFalse(form.is_valid())
+        self.assertIn('email', form.errors)
+
+    def test_blank_emails_do_not_collide(self):
+        User.objects.create_user('blankuser', '', 'password')
+        data = {'username': 'someone', 'email': '', 'password1': 'pw12345678!', 'password2': 'pw12345678!'}
+        self.assertTrue(UserCreationForm(data).is_valid())
+
+
+class EmailIndexMigrationTests(TestCase):
+    def test_case_duplicates_stop_the_migration(self):
+        migration = importlib.import_module('users.migrations.0002_user_email_ci_unique')
+        schema_editor = mock.Mock(connection=connection)
+        migration.check_case_duplicates(django_apps, schema_editor)
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX users_user_email_ci_uniq')
+        first = User.objects.create(username='first', email='Dup@Example.com')
+        second = User.objects.create(username='second', email='dup@example.com')
+        with self.assertRaisesRegex(RuntimeError, f'dup@example.com: user ids {first.id}, {second.id}'):
+            migration.check_case_duplicates(django_apps, schema_editor)
+
+
+class InstrumentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.get(name='testuser')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_histogram_percentiles(self):
+        histogram = Histogram((1, 5, 10))
+        for value in [0.5, 0.5, 3, 3, 3, 3, 3, 3, 8, 50]:
+            histogram.observe(value)
+        self.assertEqual(
+            histogram.summary(),
+            {'count': 10, 'sum': 77.0, 'max': 50, 'p50': 5, 'p90': 10, 'p99': 50},
+        )
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/apps/')
+        self.assertRegex(
+            response['Server-Timing'],
+            rf'^db;dur=[\d.]+;desc="{len(queries)} queries", serialize;dur=[\d.]+, total;dur=[\d.]+$',
+        )
+
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_header_is_staff_only_by_default(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/v1/apps/'))
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.assertIn('Server-Timing', self.client.get('/api/v1/apps/'))
+
+    @override_settings(SERVER_TIMING=False)
+    def test_unresolved_session_user_is_not_loaded(self):
+        staff = User.objects.create_user('sessionstaff', 'sessionstaff@example.com', 'password', is_staff=True)
+        client = Client()
+        client.force_login(staff)
+        # Nothing on a 404 reads request.user, so neither does the middleware.
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/no-such-page/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertFalse([query for query in queries if 'users_user' in query['sql']])
+
+    def test_endpoint_histograms(self):
+        before = endpoint_stats().get('GET apps-list', {}).get('queries', {}).get('count', 0)
+        for _ in range(3):
+            self.client.get('/api/v1/apps/')
+        stats = endpoint_stats()['GET apps-list']
+        self.assertEqual(stats['queries']['count'], before + 3)
+        self.assertGreater(stats['serializer_ms']['sum'], 0)
+        self.assertGreaterEqual(stats['latency_ms']['max'], stats['sql_ms']['max'])
+
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.assertIn('GET apps-list', self.client.get('/api/v1/metrics/').json()['endpoints'])
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_slow_queries_are_attributed_to_the_view(self):
+        with self.assertLogs('home.slow_queries', 'WARNING') as logs:
+            self.client.get('/api/v1/apps/')
+        self.assertTrue(any(
+            re.search(r'from AppViewSet\.list( \(home/api/v1/mixins\.py:\d+ in list\))?: SELECT .*home_app', line)
+            for line in logs.output
+        ), logs.output)
+
+
+class BenchmarkTests(TestCase):
+    def run_benchmark(self, *args):
+        stdout = StringIO()
+        call_command(
+            'benchmark_api', '--use-existing-db', '--users=2', '--apps=10', '--subscriptions=30',
+            '--requests=2', f'--baseline={self.baseline}', *args, stdout=stdout,
+        )
+        return stdout.getvalue()
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.baseline = os.path.join(directory.name, 'baseline.json')
+
+    def test_writes_baseline_then_compares(self):
+        self.assertIn('Wrote baseline', self.run_benchmark())
+        with open(self.baseline) as f:
+            results = json.load(f)
+        self.assertEqual(results['dataset'], {'users': 2, 'apps': 10, 'subscriptions': 30, 'requests': 2})
+        self.assertEqual(results['endpoints']['apps.detail']['queries'], 1)
+        self.assertEqual(
+            sorted(results['endpoints']),
+            sorted([f'{resource}.{action}' for resource in ('apps', 'subscriptions')
+                    for action in ('list', 'detail', 'create', 'update')] + ['plans.detail', 'plans.list']),
+        )
+        seeded = App.objects.filter(name__startswith='app-')
+        self.assertEqual(seeded.count(), 10)
+        self.assertEqual(seeded.filter(app_subscription__active=True).count(), 10)
+
+        results['endpoints']['apps.detail']['queries'] = 0
+        with open(self.baseline, 'w') as f:
+            json.dump(results, f)
+        with self.assertRaisesMessage(CommandError, 'apps.detail: 1 queries (baseline 0)'):
+            self.run_benchmark('--min-delta-ms=1000')
+
+    def test_latency_regressions(self):
+        dataset = {'users': 1, 'apps': 1, 'subscriptions': 1, 'requests': 1}
+        baseline = {'dataset': dataset, 'database': 'sqlite',
+                    'endpoints': {'apps.list': {'p50_ms': 10, 'p95_ms': 20, 'queries': 1}}}
+        results = {'dataset': dataset, 'database': 'sqlite',
+                   'endpoints': {'apps.list': {'p50_ms': 12, 'p95_ms': 40, 'queries': 1}}}
+        self.assertEqual(find_regressions(results, baseline, 0.5, 5), ['apps.list: p95_ms 40.0 (baseline 20.0)'])
+        # Below the noise floor, or on another dataset, latency is not compared.
+        self.assertEqual(find_regressions(results, baseline, 0.5, 25), [])
+        self.assertEqual(find_regressions(dict(results, dataset={}), baseline, 0.5, 5), [])
+
+
+class IndexUsageTests(TestCase):
+    """The hot API queries are served by the indexes declared on App and Subscription."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed(users=5, apps=200, subscriptions=1000)[0]
+        cls.app = App.objects.filter(user=cls.user).first()
+
+    def assertUsesIndex(self, queryset, index):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # On a test-sized table a sequential scan is always cheapest; what is
+                # checked here is that the index can serve the query at all.
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('ANALYZE')
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+        self.assertNotRegex(plan, r'Seq Scan|\bSCAN (TABLE )?home_')
+
+    def test_app_list(self):
+        self.assertUsesIndex(
+            App.objects.filter(user=self.user).order_by('created_at', 'id')[:51], 'home_app_user_created_id_idx',
+        )
+
+    def test_subscription_list(self):
+        self.assertUsesIndex(Subscription.objects.filter(user=self.user), 'home_sub_user_created_id_idx')
 
+    @skipUnless(connection.vendor == 'postgresql', "SQLite can't prove a lookup matches a partial index's NOT (...) condition")
+    def test_domain_name_lookup(self):
+        # The partial unique index is the only index on domain_name.
+        self.assertUsesIndex(App.objects.filter(domain_name='example.com'), 'home_app_domain_name_uniq')
 
+    def test_current_subscription_of_app(self):
+        self.assertUsesIndex(
+            Subscription.objects.select_related('plan').filter(subscription_app=self.app, active=True).order_by('pk')[:1],
+            'home_sub_one_active_per_app',
+        )
@@ -1,19 +1,95 @@
+import json
+import os
+from functools import lru_cache
 from pathlib import Path
-from django.urls import path, include
 
 MODULES_PACKAGE_NAME = "modules"
-MODULES_DIR = f"{Path.cwd()}/{MODULES_PACKAGE_NAME}/"
-APPS = Path(MODULES_DIR).rglob("apps.py")
+MODULES_DIR = Path(__file__).resolve().parent
+MANIFEST_PATH = MODULES_DIR / "manifest.json"
 
+# Directories that never contain module code; skipping them keeps discovery cheap
+# when a module ships its own node_modules, build output, etc.
+SKIP_DIRS = {"__pycache__", "migrations", "node_modules", "static", "templates"}
 
-def get_modules():
+
+def discover_modules(modules_dir=MODULES_DIR):
+    """
+    Walks the modules package and returns the dotted paths of the Django apps, URLconfs
+    and admin modules it contains. The modules package itself is listed as an app, but
+    its own urls.py and admin.py (which include the others) are not.
+    """
+    modules_dir = Path(modules_dir)
+    manifest = {"apps": [], "urls": [], "admins": []}
+    for root, dirs, files in os.walk(modules_dir):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS and not d.startswith("."))
+        relative = Path(root).relative_to(modules_dir).parts
+        package = ".".join((MODULES_PACKAGE_NAME,) + relative)
+        if "apps.py" in files:
+            manifest["apps"].append(package)
+        if relative:
+            if "urls.py" in files:
+                manifest["urls"].append(f"{package}.urls")
+            if "admin.py" in files:
+                manifest["admins"].append(f"{package}.admin")
+    return manifest
+
+
+def manifest_is_stale(modules_dir=MODULES_DIR, manifest_path=MANIFEST_PATH):
+    """
+    Installing or removing a module adds or removes a directory (or a top-level file in
+    one), which bumps the mtime of its parent. Checking the modules directory and its
+    direct children is a single scandir, no matter how large the modules are.
+    """
     try:
-        modules = []
-        python_package_separator = "."
-        for app in APPS:
-            app_name = app.as_posix().replace(MODULES_DIR, f"{MODULES_PACKAGE_NAME}/")
-            app_name = python_package_separator.join(app_name.split("/")[:-1])
-            modules.append(app_name)
-        return modules
-    except (ImportError, IndexError):
-        pass
+        built = os.stat(manifest_path).st_mtime_ns
+    except FileNotFoundError:
+        return True
+    if os.stat(modules_dir).st_mtime_ns > built:
+        return True
+    with os.scandir(modules_dir) as entries:
+        return any(
+            entry.is_dir() and entry.stat().st_mtime_ns > built
+            for entry in entries
+            if entry.name not in SKIP_DIRS
+        )
+
+
+def write_manifest(manifest, manifest_path=MANIFEST_PATH):
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, manifest_path)
+    # The rename itself bumps the directory mtime; keep the manifest the newest entry.
+    os.utime(manifest_path)
+
+
+def build_manifest(modules_dir=MODULES_DIR, manifest_path=MANIFEST_PATH):
+    manifest = discover_modules(modules_dir)
+    write_manifest(manifest, manifest_path)
+    return manifest
+
+
+def read_manifest(modules_dir=MODULES_DIR, manifest_path=MANIFEST_PATH):
+    """
+    Returns the manifest, rebuilding it first if the modules tree changed since it was
+    written. A read-only checkout falls back to in-memory discovery.
+    """
+    if manifest_is_stale(modules_dir, manifest_path):
+        manifest = discover_modules(modules_dir)
+        try:
+            write_manifest(manifest, manifest_path)
+        except OSError:
+            pass
+        return manifest
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def get_manifest():
+    return read_manifest()
+
+
+def get_modules():
+    return list(get_manifest()["apps"])
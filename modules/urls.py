@@ -1,9 +1,7 @@
-from pathlib import Path
-from django.conf import settings
 from django.urls import path, include
 from django.db.utils import ProgrammingError
 
-from .utils import posixpath_to_modulepath
+from .manifest import get_manifest
 
 urlpatterns = []
 
@@ -12,21 +10,11 @@ urlpatterns = []
 # Crowdbotics' official modules working properly.
 
 try:
-    base_dir = Path(settings.BASE_DIR)
-    modules_dir = base_dir / "modules"
-    urls = modules_dir.rglob("urls.py")
-    for url in urls:
-        module_name, _ = url.as_posix().split("/")[-2:]
-        if not module_name == "modules":
-            module_url = module_name.replace("_", "-")
-            urlpatterns += [
-                path(f"{module_url}/",
-                     include(
-                        posixpath_to_modulepath(
-                            url.relative_to(base_dir)
-                        )
-                     )
-                )  # noqa
-            ]
+    for module_urls in get_manifest()["urls"]:
+        module_name = module_urls.split(".")[-2]
+        module_url = module_name.replace("_", "-")
+        urlpatterns += [
+            path(f"{module_url}/", include(module_urls))  # noqa
+        ]
 except (ImportError, IndexError, ProgrammingError):
     pass
@@ -1,9 +1,15 @@
 import importlib
 import json
+import os
+import threading
+import time
 
 from pathlib import Path
+from types import ModuleType
 
-GLOBAL_OPTIONS_FILE_PATH = f"{Path.cwd()}/modules/options.json"
+from .manifest import MODULES_DIR, MODULES_PACKAGE_NAME, SKIP_DIRS
+
+GLOBAL_OPTIONS_FILE_PATH = f"{MODULES_DIR}/options.json"
 
 
 def posixpath_to_modulepath(posixpath):
@@ -11,25 +17,107 @@ def posixpath_to_modulepath(posixpath):
     return f"{module_parent_path}.{posixpath.stem}"
 
 
-def get_options(module_slug, option_key):
-    with open(GLOBAL_OPTIONS_FILE_PATH, "r") as f:
-        all_module_options = json.loads(f.read())
-        all_module_options = all_module_options.get("module_options", None)
+class OptionsRegistry:
+    """
+    Module options, merged from the `module_options` section of options.json and the
+    defaults in each module's options.py.
+
+    options.json is parsed once and re-read only when its mtime changes, checked at
+    most every `check_interval` seconds. options.py modules are located with a single
+    walk of the modules package and imported once per slug, so a lookup inside a
+    request handler is a couple of dict lookups.
+    """
+
+    def __init__(self, options_path=GLOBAL_OPTIONS_FILE_PATH, modules_dir=MODULES_DIR, check_interval=1.0):
+        self.options_path = options_path
+        self.modules_dir = Path(modules_dir)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = None
+        self._module_options = {}
+        self._options_modules = None
+        self._defaults = {}
+
+    def reload(self):
+        with self._lock:
+            self._mtime = None
+            self._checked_at = None
+            self._options_modules = None
+            self._defaults = {}
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            mtime = os.stat(self.options_path).st_mtime_ns
+            if mtime == self._mtime:
+                return
+            with open(self.options_path, "r") as f:
+                self._module_options = json.loads(f.read()).get("module_options", None) or {}
+            self._mtime = mtime
+
+    def _index_options_modules(self):
+        # Maps every directory name under the modules package to the first options.py
+        # at or below it, the same match the per-slug `**/<slug>/**/options.py` glob made.
+        index = {}
+        for root, dirs, files in os.walk(self.modules_dir):
+            dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS and not d.startswith("."))
+            if "options.py" not in files:
+                continue
+            parts = Path(root).relative_to(self.modules_dir).parts
+            module_path = ".".join((MODULES_PACKAGE_NAME,) + parts + ("options",))
+            for name in parts:
+                index.setdefault(name, module_path)
+        return index
 
-    option_value = None
+    def get_defaults(self, module_slug):
+        defaults = self._defaults.get(module_slug)
+        if defaults is None:
+            with self._lock:
+                if self._options_modules is None:
+                    self._options_modules = self._index_options_modules()
+                options_module = self._options_modules.get(module_slug.replace("-", "_"))
+            if options_module is None:
+                raise LookupError(f"No options.py found for module '{module_slug}'.")
+            module = importlib.import_module(options_module)
+            defaults = {
+                name: value
+                for name, value in vars(module).items()
+                if not name.startswith("_") and not isinstance(value, ModuleType)
+            }
+            self._defaults[module_slug] = defaults
+        return defaults
 
-    if all_module_options:
-        module_options = all_module_options.get(module_slug, None)
-        if module_options:
-            option_value = module_options.get(option_key, None)
+    def get_overrides(self, module_slug):
+        self._refresh()
+        return self._module_options.get(module_slug, None) or {}
 
-    module_options_file = next(
-        Path(".").rglob(f"**/{module_slug.replace('-', '_')}/**/options.py")
-    )
+    def get_option(self, module_slug, option_key):
+        option_value = self.get_overrides(module_slug).get(option_key, None)
+        if option_value:
+            return option_value
+        defaults = self.get_defaults(module_slug)
+        if option_key not in defaults:
+            raise AttributeError(f"Module '{module_slug}' has no option '{option_key}'.")
+        return defaults[option_key]
+
+    def get_all_options(self, module_slug):
+        options = dict(self.get_defaults(module_slug))
+        options.update(
+            (key, value) for key, value in self.get_overrides(module_slug).items() if value
+        )
+        return options
+
+
+options_registry = OptionsRegistry()
+
+
+def get_options(module_slug, option_key):
+    return options_registry.get_option(module_slug, option_key)
 
-    options_module = posixpath_to_modulepath(module_options_file)
-    default_value = getattr(
-        importlib.import_module(options_module), option_key
-    )
 
-    return option_value if option_value else default_value
+def get_all_options(module_slug):
+    return options_registry.get_all_options(module_slug)
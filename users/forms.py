@@ -5,12 +5,26 @@ from django.utils.translation import ugettext_lazy as _
 User = get_user_model()
 
 
-class UserChangeForm(forms.UserChangeForm):
+class CaseInsensitiveEmailMixin:
+    """
+    Rejects an e-mail another user has in any case, which the users_user_email_ci_uniq
+    index would otherwise turn into an IntegrityError on save.
+    """
+    duplicate_email_message = _("A user is already registered with this e-mail address.")
+
+    def clean_email(self):
+        email = self.cleaned_data["email"]
+        if email and User.objects.filter(email__iexact=email).exclude(pk=self.instance.pk).exists():
+            raise ValidationError(self.duplicate_email_message, code="duplicate_email")
+        return email
+
+
+class UserChangeForm(CaseInsensitiveEmailMixin, forms.UserChangeForm):
     class Meta(forms.UserChangeForm.Meta):
         model = User
 
 
-class UserCreationForm(forms.UserCreationForm):
+class UserCreationForm(CaseInsensitiveEmailMixin, forms.UserCreationForm):
 
     error_message = forms.UserCreationForm.error_messages.update(
         {"duplicate_username": _("This username has already been taken.")}
@@ -18,6 +32,7 @@ class UserCreationForm(forms.UserCreationForm):
 
     class Meta(forms.UserCreationForm.Meta):
         model = User
+        fields = ("username", "email")
 
     def clean_username(self):
         username = self.cleaned_data["username"]
@@ -0,0 +1,50 @@
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_case_duplicates(apps, schema_editor):
+    """
+    Fails before the index is built if e-mails differ only in case. Which account
+    keeps such an address (and what happens to the other's apps and tokens) is an
+    operator's call, so they are listed rather than merged here.
+    """
+    User = apps.get_model("users", "User")
+    users = User.objects.using(schema_editor.connection.alias)
+    duplicates = (
+        users.exclude(email="")
+        .annotate(email_lower=Lower("email"))
+        .values("email_lower")
+        .annotate(accounts=Count("id"))
+        .filter(accounts__gt=1)
+        .order_by("email_lower")
+    )
+    if duplicates:
+        lines = []
+        for row in duplicates:
+            ids = users.filter(email__iexact=row["email_lower"]).order_by("id").values_list("id", flat=True)
+            lines.append(f"{row['email_lower']}: user ids {', '.join(map(str, ids))}")
+        raise RuntimeError(
+            "Cannot add the case-insensitive unique index on users_user.email: these addresses "
+            "belong to several users. Merge the accounts or change their e-mails, then migrate "
+            "again.\n" + "\n".join(lines)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    # Case-insensitive uniqueness of non-empty e-mails, enforced by the database so
+    # concurrent signups cannot both pass the application-level check. Written as SQL
+    # because Django 2.2 has no expression indexes; the syntax is shared by
+    # PostgreSQL and SQLite.
+    operations = [
+        migrations.RunPython(check_case_duplicates, migrations.RunPython.noop),
+        migrations.RunSQL(
+            "CREATE UNIQUE INDEX users_user_email_ci_uniq ON users_user (LOWER(email)) WHERE email <> ''",
+            "DROP INDEX users_user_email_ci_uniq",
+        ),
+    ]